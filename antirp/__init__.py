@@ -4,4 +4,6 @@ __red_end_user_data_statement__ = "AntiRP stores no personal information."
 
 
 async def setup(bot):
-    await bot.add_cog(AntiRP(bot))
+    cog = AntiRP(bot)
+    await cog.initialize()
+    await bot.add_cog(cog)
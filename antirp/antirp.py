@@ -4,8 +4,16 @@
   file, You can obtain one at http://mozilla.org/MPL/2.0/.
 """
 
+import time
+from typing import Dict, Optional
+
 import discord
 from redbot.core import commands, checks, Config
+from redbot.core.utils.chat_formatting import box, pagify
+
+from .census import BATCH_SIZE, MAX_DURATION, MAX_MESSAGES, InviteCensus, invite_application
+from .deletion import DeletionQueue
+from .policy import DISABLED_POLICY, GuildPolicy
 
 
 class AntiRP(commands.Cog):
@@ -21,6 +29,22 @@ class AntiRP(commands.Cog):
         self.config = Config.get_conf(self, identifier=25360008)
 
         self.config.register_guild(**self.def_guild)
+        # guild_id -> policy, guilds without any settings are left out
+        self.policies: Dict[int, GuildPolicy] = {}
+        self.deletion_queue = DeletionQueue()
+
+    async def initialize(self):
+        self.policies = {
+            guild_id: GuildPolicy.from_config(guild_data)
+            for guild_id, guild_data in (await self.config.all_guilds()).items()
+        }
+
+    async def update_policy(self, guild: discord.Guild) -> None:
+        """Reload the policy of the guild after its settings were changed."""
+        self.policies[guild.id] = GuildPolicy.from_config(await self.config.guild(guild).all())
+
+    def cog_unload(self):
+        self.deletion_queue.close()
 
     async def red_get_data_for_user(self, **kwargs):
         return {}
@@ -41,30 +65,118 @@ class AntiRP(commands.Cog):
             toggle_config = await self.config.guild(ctx.guild).toggle()
             if toggle_config is True:
                 await self.config.guild(ctx.guild).toggle.set(False)
+                await self.update_policy(ctx.guild)
                 await ctx.send(f"Done! Turned off AntiRP")
             else:
                 await self.config.guild(ctx.guild).toggle.set(True)
+                await self.update_policy(ctx.guild)
                 await ctx.send(f"Done! Turned on AntiRP")
         else:
             await self.config.guild(ctx.guild).toggle.set(true_or_false)
+            await self.update_policy(ctx.guild)
             await ctx.tick()
 
+    @antirp.command()
+    async def stats(self, ctx):
+        """Show how many invites AntiRP removed since the cog was loaded"""
+        queue = self.deletion_queue
+        await ctx.send(
+            f"Deleted messages: ``{queue.deleted}``\n"
+            f"Failed deletions: ``{queue.failed}``\n"
+            f"Waiting for deletion: ``{queue.queued}``\n"
+            f"Bulk delete requests: ``{queue.bulk_requests}``\n"
+            f"Single delete requests: ``{queue.single_requests}``"
+        )
+
+    @staticmethod
+    def _history_access_error(ctx, channel: discord.TextChannel) -> Optional[str]:
+        """Check that both the author and the bot can read the channel's history."""
+        if channel.guild != ctx.guild:
+            return "That channel isn't in this server."
+        author_permissions = channel.permissions_for(ctx.author)
+        if not (author_permissions.view_channel and author_permissions.read_message_history):
+            return "You can't read the message history of that channel."
+        my_permissions = channel.permissions_for(ctx.guild.me)
+        if not (my_permissions.view_channel and my_permissions.read_message_history):
+            return "I can't read the message history of that channel."
+        return None
+
     @antirp.command()
     async def grabname(self, ctx, channel: discord.TextChannel, messageID: int):
         """Grab an application name via RP Invite"""
+        if (error := self._history_access_error(ctx, channel)) is not None:
+            return await ctx.send(error)
         try:
-            message = await channel.get_message(messageID)
+            message = await channel.fetch_message(messageID)
         except discord.NotFound:
             return await ctx.send("Couldn't find the message you're looking for.")
+        except discord.Forbidden:
+            return await ctx.send("I can't read the messages in that channel.")
 
-        # Since invites all use party IDs we can savely assume that this is a RP invite.
-        if message.activity is None:
+        application = invite_application(message)
+        if application is None:
             return await ctx.send("This message has no rich presence invite")
+        application_id, name = application
+        if application_id is None:
+            return await ctx.send(f"Application name: {name}")
+        return await ctx.send(f"Application name: {name}\nApplication ID: ``{application_id}``")
+
+    @antirp.command()
+    async def census(
+        self,
+        ctx,
+        channel: discord.TextChannel,
+        max_messages: int = 10_000,
+        max_seconds: int = 120,
+    ):
+        """Count the applications of rich presence invites in a channel's history
+
+        Reads up to ``max_messages`` messages (at most 100000), newest first,
+        and stops after ``max_seconds`` seconds (at most 900).
+        The entries in the result can be added to the whitelist as they are."""
+        if (error := self._history_access_error(ctx, channel)) is not None:
+            return await ctx.send(error)
+        max_messages = max(1, min(max_messages, MAX_MESSAGES))
+        deadline = time.monotonic() + max(1, min(max_seconds, MAX_DURATION))
 
-        # Check if this is spotify or not... Since spotify is SPECIAL! T_T
-        if message.activity["party_id"].startswith("spotify:"):
-            return await ctx.send("Application name: Spotify")
-        return await ctx.send(f"Application name: {message.application['name']}")
+        census = InviteCensus()
+        progress = await ctx.send(f"Scanning {channel.mention}...")
+        timed_out = False
+        async for message in channel.history(limit=max_messages):
+            census.add(message)
+            if census.scanned % BATCH_SIZE:
+                continue
+            if time.monotonic() >= deadline:
+                timed_out = True
+                break
+            try:
+                await progress.edit(
+                    content=(
+                        f"Scanning {channel.mention}... ``{census.scanned}``/``{max_messages}``"
+                        f" messages, ``{census.invites}`` invites so far."
+                    )
+                )
+            except discord.HTTPException:
+                pass
+
+        summary = f"Scanned ``{census.scanned}`` messages in {channel.mention}"
+        if timed_out:
+            summary += " before running out of time"
+        summary += f", found ``{census.invites}`` invites."
+        try:
+            await progress.edit(content=summary)
+        except discord.HTTPException:
+            await ctx.send(summary)
+        rows = census.rows()
+        if not rows:
+            return
+        id_width = max(len("Entry"), *(len(entry) for entry, _, _ in rows))
+        table = "\n".join(
+            [f"{'Entry':<{id_width}}  {'Count':>6}  Name"]
+            + [f"{entry:<{id_width}}  {count:>6}  {name}" for entry, name, count in rows]
+        )
+        for page in pagify(table, shorten_by=10):
+            await ctx.send(box(page))
 
     @antirp.group()
     async def whitelist(self, ctx):
@@ -74,29 +186,35 @@ class AntiRP(commands.Cog):
         any other applications not matching the name will be removed.
         Regardless if the permissions are valid.
 
+        Entries can be application IDs, application names or name patterns such as ``rpg*``.
+        IDs keep working when an application is renamed.
+
         Even though Spotify isn't an application it can be added as a whitelisted application"""
         pass
 
-    @whitelist.command(name="add", usage="<Application name>")
+    @whitelist.command(name="add", usage="<Application ID, name or pattern>")
     async def wl_add(self, ctx, *, application_name: str):
         """Add a new whitelisted application"""
         whitelist_config = await self.config.guild(ctx.guild).whitelist()
         whitelist_config.append(application_name.lower())
         await self.config.guild(ctx.guild).whitelist.set(whitelist_config)
+        await self.update_policy(ctx.guild)
         await ctx.tick()
 
-    @whitelist.command(name="remove", usage="<Application name>")
+    @whitelist.command(name="remove", usage="<Application ID, name or pattern>")
     async def wl_remove(self, ctx, *, application_name: str):
         """Remove a whitelisted application"""
         whitelist_config = await self.config.guild(ctx.guild).whitelist()
         whitelist_config.remove(application_name.lower())
         await self.config.guild(ctx.guild).whitelist.set(whitelist_config)
+        await self.update_policy(ctx.guild)
         await ctx.tick()
 
     @whitelist.command(name="clear")
     async def wl_clear(self, ctx):
         """Remove all whitelisted applications"""
         await self.config.guild(ctx.guild).whitelist.set([])
+        await self.update_policy(ctx.guild)
         await ctx.tick()
 
     @whitelist.command(name="list")
@@ -116,35 +234,25 @@ class AntiRP(commands.Cog):
             return False
         return await func(self, guild)
 
+    @commands.Cog.listener()
     async def on_message(self, message):
-        if message.guild is None:
+        # Nearly every message ends here, so nothing may be awaited before these checks.
+        if message.guild is None or message.activity is None:
             return
-
-        if await self.cog_disabled_in_guild(message.guild):
+        policy = self.policies.get(message.guild.id, DISABLED_POLICY)
+        if not policy.enabled:
             return
 
-        guild_config = self.config.guild(message.guild)
-        toggle_config = await guild_config.toggle()
-        whitelist_config = await guild_config.whitelist()
-
-        if message.guild is None or message.activity is None or toggle_config is False:
+        if await self.cog_disabled_in_guild(message.guild):
             return
         if await self.bot.is_automod_immune(message.author) is True:
             return  # End it because we're dealing with a mod.
 
         if message.channel.permissions_for(message.author).embed_links is False:
-            try:
-                return await message.delete()
-            except discord.Forbidden:
-                return
+            return self.deletion_queue.submit(message)
 
-        if len(whitelist_config) != 0:
+        if policy.whitelist:
             # We got entries in the whitelist, do special checks.
-            if "spotify" in whitelist_config and message.activity["party_id"].startswith("spotify:"):
-                return  # Deal with spotify in the whitelist
-            if message.application is not None and message.application["name"].lower() in whitelist_config:
-                return  # Deal with applications in the whitelist
-            try:
-                return await message.delete()  # Handle not in whitelists.
-            except:
-                return
+            if policy.whitelist.matches_message(message):
+                return  # Deal with applications (and spotify) in the whitelist
+            return self.deletion_queue.submit(message)  # Handle not in whitelists.
@@ -0,0 +1,194 @@
+"""
+  This Source Code Form is subject to the terms of the Mozilla Public
+  License, v. 2.0. If a copy of the MPL was not distributed with this
+  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+# Benchmark of ``AntiRP.on_message`` against a synthetic message stream.
+#
+# Config and the bot are stubbed, so this measures the handler itself
+# and counts how many Config reads it does per message.
+#
+#     python -m antirp.benchmark --messages 200000 --invite-ratio 0.01
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List
+from unittest import mock
+
+from redbot.core import Config
+
+from .antirp import AntiRP
+
+WHITELISTED_APPS = [(1000 + idx, f"Whitelisted Game {idx}") for idx in range(20)]
+OTHER_APPS = [(2000 + idx, f"Other Game {idx}") for idx in range(200)]
+
+
+class StubValue:
+    def __init__(self, config: "StubConfig", value: Any) -> None:
+        self._config = config
+        self._value = value
+
+    async def __call__(self) -> Any:
+        self._config.calls += 1
+        return self._value
+
+    async def set(self, value: Any) -> None:
+        self._config.calls += 1
+        self._value = value
+
+
+class StubGroup:
+    def __init__(self, config: "StubConfig", data: Dict[str, Any]) -> None:
+        self._config = config
+        self._data = data
+
+    def __getattr__(self, name: str) -> StubValue:
+        return StubValue(self._config, self._data[name])
+
+    async def all(self) -> Dict[str, Any]:
+        self._config.calls += 1
+        return dict(self._data)
+
+
+class StubConfig:
+    """Just enough of Config for AntiRP, counting every read and write."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.defaults: Dict[str, Any] = {}
+        self.guilds: Dict[int, Dict[str, Any]] = {}
+
+    def register_guild(self, **defaults: Any) -> None:
+        self.defaults = defaults
+
+    def guild(self, guild) -> StubGroup:
+        data = self.guilds.setdefault(guild.id, {**self.defaults, "whitelist": []})
+        return StubGroup(self, data)
+
+    async def all_guilds(self) -> Dict[int, Dict[str, Any]]:
+        self.calls += 1
+        return {guild_id: dict(data) for guild_id, data in self.guilds.items()}
+
+
+class StubBot:
+    async def cog_disabled_in_guild(self, cog, guild) -> bool:
+        return False
+
+    async def is_automod_immune(self, member) -> bool:
+        return False
+
+
+class StubDeletionQueue:
+    def __init__(self) -> None:
+        self.submitted = 0
+
+    def submit(self, message) -> None:
+        self.submitted += 1
+
+    def close(self) -> None:
+        pass
+
+
+def make_messages(count: int, *, guilds: int, invite_ratio: float, seed: int) -> List[Any]:
+    rng = random.Random(seed)
+    permissions = SimpleNamespace(embed_links=True)
+    channels = [
+        SimpleNamespace(id=guild_id * 100 + idx, permissions_for=lambda member: permissions)
+        for guild_id in range(1, guilds + 1)
+        for idx in range(5)
+    ]
+    messages = []
+    for message_id in range(count):
+        channel = rng.choice(channels)
+        message = SimpleNamespace(
+            id=message_id,
+            guild=SimpleNamespace(id=channel.id // 100),
+            channel=channel,
+            author=SimpleNamespace(id=rng.randrange(10000)),
+            activity=None,
+            application=None,
+        )
+        if rng.random() < invite_ratio:
+            if rng.random() < 0.05:
+                message.activity = {"type": 3, "party_id": f"spotify:{message_id}"}
+            else:
+                apps = WHITELISTED_APPS if rng.random() < 0.5 else OTHER_APPS
+                app_id, name = rng.choice(apps)
+                message.activity = {"type": 1, "party_id": str(message_id)}
+                message.application = SimpleNamespace(id=app_id, name=name)
+        messages.append(message)
+    return messages
+
+
+def percentile(samples: List[int], fraction: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))] / 1000
+
+
+def report(label: str, samples: List[int]) -> None:
+    if not samples:
+        print(f"{label:>8}: no messages")
+        return
+    samples.sort()
+    print(
+        f"{label:>8}: {len(samples):>8} messages, mean {statistics.fmean(samples) / 1000:8.2f}us,"
+        f" p50 {percentile(samples, 0.5):8.2f}us, p99 {percentile(samples, 0.99):8.2f}us,"
+        f" p99.9 {percentile(samples, 0.999):8.2f}us, max {samples[-1] / 1000:8.2f}us"
+    )
+
+
+async def run(args: argparse.Namespace) -> None:
+    config = StubConfig()
+    with mock.patch.object(Config, "get_conf", return_value=config):
+        cog = AntiRP(StubBot())
+    cog.deletion_queue = StubDeletionQueue()
+    for guild_id in range(1, args.guilds + 1):
+        whitelist = [name.lower() for _, name in WHITELISTED_APPS[:10]]
+        whitelist += [str(app_id) for app_id, _ in WHITELISTED_APPS[10:]]
+        whitelist += ["spotify", "no such game *"]
+        config.guilds[guild_id] = {"toggle": guild_id % 4 != 0, "whitelist": whitelist}
+    await cog.initialize()
+
+    messages = make_messages(
+        args.messages, guilds=args.guilds, invite_ratio=args.invite_ratio, seed=args.seed
+    )
+    for message in messages[: min(1000, len(messages))]:
+        await cog.on_message(message)  # warm up
+
+    config.calls = 0
+    cog.deletion_queue.submitted = 0
+    plain: List[int] = []
+    invites: List[int] = []
+    clock = time.perf_counter_ns
+    started = clock()
+    for message in messages:
+        before = clock()
+        await cog.on_message(message)
+        elapsed = clock() - before
+        (plain if message.activity is None else invites).append(elapsed)
+    total = clock() - started
+
+    print(f"{len(messages)} messages in {total / 1e9:.3f}s across {args.guilds} guilds")
+    report("plain", plain)
+    report("invites", invites)
+    report("all", plain + invites)
+    print(f"Config calls per message: {config.calls / len(messages):.4f}")
+    print(f"Deletions queued: {cog.deletion_queue.submitted}")
+    cog.cog_unload()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark AntiRP.on_message")
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--guilds", type=int, default=50)
+    parser.add_argument("--invite-ratio", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
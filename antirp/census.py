@@ -0,0 +1,62 @@
+"""
+  This Source Code Form is subject to the terms of the Mozilla Public
+  License, v. 2.0. If a copy of the MPL was not distributed with this
+  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import discord
+
+# Messages read from the history between progress updates.
+BATCH_SIZE = 500
+# Caps on a single census.
+MAX_MESSAGES = 100_000
+MAX_DURATION = 900
+
+
+def invite_application(message: discord.Message) -> Optional[Tuple[Optional[int], str]]:
+    """Get the ``(application ID, name)`` of a rich presence invite, None for other messages.
+
+    Spotify isn't an application, so its ID is None.
+    """
+    # Since invites all use party IDs we can savely assume that this is a RP invite.
+    if message.activity is None:
+        return None
+    # Check if this is spotify or not... Since spotify is SPECIAL! T_T
+    if str(message.activity.get("party_id", "")).startswith("spotify:"):
+        return None, "Spotify"
+    if message.application is None:
+        return None, "Unknown application"
+    return message.application.id, message.application.name
+
+
+class InviteCensus:
+    """Frequency table of the applications whose invites were seen in a channel."""
+
+    def __init__(self) -> None:
+        self.scanned = 0
+        self.counts: Counter = Counter()
+        # application ID (name for Spotify) -> the last name it was seen with
+        self.names: Dict[object, str] = {}
+
+    @property
+    def invites(self) -> int:
+        return sum(self.counts.values())
+
+    def add(self, message: discord.Message) -> None:
+        self.scanned += 1
+        application = invite_application(message)
+        if application is None:
+            return
+        application_id, name = application
+        key = application_id if application_id is not None else name.lower()
+        self.counts[key] += 1
+        self.names[key] = name
+
+    def rows(self) -> List[Tuple[str, str, int]]:
+        """Get ``(whitelist entry, name, count)`` rows, most common first."""
+        return [
+            (str(key), self.names[key], count) for key, count in self.counts.most_common()
+        ]
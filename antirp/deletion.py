@@ -0,0 +1,115 @@
+"""
+  This Source Code Form is subject to the terms of the Mozilla Public
+  License, v. 2.0. If a copy of the MPL was not distributed with this
+  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import asyncio
+import datetime
+import logging
+from typing import Dict, List
+
+import discord
+
+log = logging.getLogger("red.antirp.deletion")
+
+# How long offending messages are collected before they're deleted together, in seconds.
+BATCH_WINDOW = 1.0
+# Discord's limit of messages per bulk delete.
+BULK_DELETE_LIMIT = 100
+# Bulk delete only accepts messages younger than 14 days, leave some margin for clock drift.
+BULK_DELETE_MAX_AGE = datetime.timedelta(days=14) - datetime.timedelta(minutes=5)
+
+
+class DeletionQueue:
+    """Deletes messages per channel in batches, using bulk delete where possible.
+
+    Each channel with pending deletions has a single worker,
+    messages queued while it's busy simply go into its next batch.
+    """
+
+    def __init__(self, *, window: float = BATCH_WINDOW) -> None:
+        self.window = window
+        # channel_id -> ids of the messages to delete, in the order they were queued
+        self._pending: Dict[int, Dict[int, None]] = {}
+        self._channels: Dict[int, discord.abc.Messageable] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self.deleted = 0
+        self.failed = 0
+        self.bulk_requests = 0
+        self.single_requests = 0
+
+    @property
+    def queued(self) -> int:
+        return sum(len(message_ids) for message_ids in self._pending.values())
+
+    def submit(self, message: discord.Message) -> None:
+        """Queue the message for deletion, this never waits."""
+        channel_id = message.channel.id
+        self._pending.setdefault(channel_id, {})[message.id] = None
+        self._channels[channel_id] = message.channel
+        if channel_id not in self._workers:
+            self._workers[channel_id] = asyncio.create_task(self._worker(channel_id))
+
+    def close(self) -> None:
+        for task in self._workers.values():
+            task.cancel()
+        self._workers.clear()
+        self._pending.clear()
+        self._channels.clear()
+
+    async def _worker(self, channel_id: int) -> None:
+        try:
+            while self._pending.get(channel_id):
+                await asyncio.sleep(self.window)
+                channel = self._channels[channel_id]
+                message_ids = list(self._pending.pop(channel_id))
+                handled = self.deleted + self.failed
+                try:
+                    await self._delete(channel, message_ids)
+                except Exception:
+                    log.exception("Unexpected error while deleting messages in channel %s", channel_id)
+                    # whatever wasn't counted yet is lost with this batch
+                    self.failed += len(message_ids) - (self.deleted + self.failed - handled)
+        finally:
+            if self._workers.get(channel_id) is asyncio.current_task():
+                del self._workers[channel_id]
+                if channel_id not in self._pending:
+                    self._channels.pop(channel_id, None)
+
+    async def _delete(self, channel, message_ids: List[int]) -> None:
+        threshold = discord.utils.utcnow() - BULK_DELETE_MAX_AGE
+        recent = []
+        old = []
+        for message_id in message_ids:
+            if discord.utils.snowflake_time(message_id) > threshold:
+                recent.append(message_id)
+            else:
+                old.append(message_id)
+
+        for start in range(0, len(recent), BULK_DELETE_LIMIT):
+            chunk = recent[start:start + BULK_DELETE_LIMIT]
+            if len(chunk) == 1:
+                old.extend(chunk)
+                continue
+            self.bulk_requests += 1
+            try:
+                await channel.delete_messages([discord.Object(message_id) for message_id in chunk])
+            except discord.Forbidden:
+                self.failed += len(chunk)
+            except discord.HTTPException as e:
+                log.debug("Bulk delete in channel %s failed, deleting one by one: %s", channel.id, e)
+                old.extend(chunk)
+            else:
+                self.deleted += len(chunk)
+
+        for message_id in old:
+            self.single_requests += 1
+            try:
+                await channel.get_partial_message(message_id).delete()
+            except discord.NotFound:
+                self.deleted += 1  # somebody else got to it first
+            except discord.HTTPException:
+                self.failed += 1
+            else:
+                self.deleted += 1
@@ -0,0 +1,85 @@
+"""
+  This Source Code Form is subject to the terms of the Mozilla Public
+  License, v. 2.0. If a copy of the MPL was not distributed with this
+  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import fnmatch
+import re
+from typing import Any, FrozenSet, Iterable, Mapping, NamedTuple, Optional, Pattern
+
+import discord
+
+# Characters that make a whitelist entry a glob pattern.
+GLOB_CHARACTERS = frozenset("*?[")
+
+
+class WhitelistMatcher:
+    """The whitelist of a guild compiled for matching.
+
+    Entries are application IDs, exact application names or glob patterns over names,
+    all names are matched case insensitively. Numeric entries match both IDs and names.
+    IDs and exact names are set lookups, the patterns are compiled into a single regex.
+    Spotify has no application, it's matched by the name ``spotify``.
+    """
+
+    __slots__ = ("ids", "names", "pattern")
+
+    def __init__(self, entries: Iterable[str] = ()) -> None:
+        ids = set()
+        names = set()
+        patterns = []
+        for entry in entries:
+            entry = entry.strip().lower()
+            if entry.isdigit():
+                # could just as well be the name of an application, like before IDs were supported
+                ids.add(int(entry))
+                names.add(entry)
+            elif GLOB_CHARACTERS.intersection(entry):
+                patterns.append(fnmatch.translate(entry))
+            elif entry:
+                names.add(entry)
+        self.ids: FrozenSet[int] = frozenset(ids)
+        self.names: FrozenSet[str] = frozenset(names)
+        self.pattern: Optional[Pattern[str]] = (
+            re.compile("|".join(patterns)) if patterns else None
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self.ids or self.names or self.pattern)
+
+    def matches(self, application_id: Optional[int], name: Optional[str]) -> bool:
+        if application_id is not None and application_id in self.ids:
+            return True
+        if name is None:
+            return False
+        name = name.lower()
+        if name in self.names:
+            return True
+        return self.pattern is not None and self.pattern.match(name) is not None
+
+    def matches_message(self, message: discord.Message) -> bool:
+        """Check whether the rich presence invite in the message is whitelisted."""
+        if str((message.activity or {}).get("party_id", "")).startswith("spotify:"):
+            return self.matches(None, "spotify")
+        application = message.application
+        if application is None:
+            return False
+        return self.matches(application.id, application.name)
+
+
+class GuildPolicy(NamedTuple):
+    """The AntiRP settings of a guild, as used by the message handler."""
+
+    enabled: bool = False
+    whitelist: WhitelistMatcher = WhitelistMatcher()
+
+    @classmethod
+    def from_config(cls, guild_data: Mapping[str, Any]) -> "GuildPolicy":
+        return cls(
+            enabled=guild_data["toggle"],
+            whitelist=WhitelistMatcher(guild_data["whitelist"]),
+        )
+
+
+DISABLED_POLICY = GuildPolicy()
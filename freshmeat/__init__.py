@@ -1,8 +1,12 @@
 from .freshmeat import Freshmeat
 
-__red_end_user_data_statement__ = "Freshmeat stores no user data."
+__red_end_user_data_statement__ = (
+    "Freshmeat stores no user data, unless the join journal is turned on in a server.\n"
+    "The journal stores the IDs of members along with when they joined and left the server."
+)
 
 
 async def setup(bot):
     freshmeat = Freshmeat(bot)
+    await freshmeat.initialize()
     await bot.add_cog(freshmeat)
@@ -0,0 +1,100 @@
+"""
+  This Source Code Form is subject to the terms of the Mozilla Public
+  License, v. 2.0. If a copy of the MPL was not distributed with this
+  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+# Milliseconds between the Unix epoch and the Discord epoch, snowflakes count from the latter.
+DISCORD_EPOCH = 1420070400000
+# A minute is part of a burst when it has at least this many joins
+# and is this many standard deviations above the median minute.
+# Joins per minute are roughly Poisson distributed, so the deviation is the root of the median,
+# the median keeps the bursts themselves from raising the bar.
+BURST_MIN_JOINS = 5
+BURST_SIGMA = 6.0
+# Upper bounds of the account age buckets in days, at the time of joining.
+AGE_BUCKETS = (1, 7, 30, 365)
+AGE_LABELS = ("< 1 day", "< 1 week", "< 1 month", "< 1 year", "older")
+# Accounts younger than this when joining are checked for creation time clusters.
+NEW_ACCOUNT_DAYS = 7
+CLUSTER_SECONDS = 600
+
+
+@dataclass
+class JoinWaves:
+    joins: int
+    minutes: int
+    peak_minute: float  # timestamp of the busiest minute
+    peak_joins: int
+    burst_threshold: float
+    # (start timestamp, end timestamp, joins) of each run of burst minutes
+    bursts: List[Tuple[float, float, int]]
+    age_counts: List[int]
+    median_age_days: float
+    # start timestamp and size of the largest group of new accounts created close together
+    cluster_start: float
+    cluster_size: int
+
+
+def snowflake_times(member_ids: np.ndarray) -> np.ndarray:
+    """Creation timestamps in seconds encoded in the snowflakes."""
+    return ((member_ids >> np.uint64(22)).astype(np.float64) + DISCORD_EPOCH) / 1000
+
+
+def analyse(joined: Sequence[Tuple[float, int]], since: float, until: float) -> JoinWaves:
+    """Analyse ``(joined timestamp, member ID)`` pairs of the members that joined in the window."""
+    count = len(joined)
+    joined_at = np.fromiter((entry[0] for entry in joined), dtype=np.float64, count=count)
+    member_ids = np.fromiter((entry[1] for entry in joined), dtype=np.uint64, count=count)
+    created_at = snowflake_times(member_ids)
+
+    minutes = max(1, int(np.ceil((until - since) / 60)))
+    minute_idx = np.clip(((joined_at - since) // 60).astype(np.int64), 0, minutes - 1)
+    per_minute = np.bincount(minute_idx, minlength=minutes)
+    baseline = float(np.median(per_minute))
+    threshold = max(BURST_MIN_JOINS, baseline + BURST_SIGMA * np.sqrt(max(baseline, 1.0)))
+    peak = int(per_minute.argmax())
+
+    bursts = []
+    burst_minutes = np.flatnonzero(per_minute >= threshold)
+    if burst_minutes.size:
+        # split wherever consecutive burst minutes aren't adjacent
+        runs = np.split(burst_minutes, np.flatnonzero(np.diff(burst_minutes) > 1) + 1)
+        for run in runs:
+            bursts.append(
+                (
+                    since + int(run[0]) * 60,
+                    since + (int(run[-1]) + 1) * 60,
+                    int(per_minute[run].sum()),
+                )
+            )
+
+    age_days = (joined_at - created_at) / 86400
+    age_counts = np.bincount(
+        np.searchsorted(AGE_BUCKETS, age_days, side="right"), minlength=len(AGE_LABELS)
+    )
+
+    cluster_start, cluster_size = 0.0, 0
+    new_created = created_at[age_days < NEW_ACCOUNT_DAYS]
+    if new_created.size:
+        buckets, counts = np.unique(new_created // CLUSTER_SECONDS, return_counts=True)
+        largest = int(counts.argmax())
+        cluster_start, cluster_size = float(buckets[largest] * CLUSTER_SECONDS), int(counts[largest])
+
+    return JoinWaves(
+        joins=count,
+        minutes=minutes,
+        peak_minute=since + peak * 60,
+        peak_joins=int(per_minute[peak]),
+        burst_threshold=float(threshold),
+        bursts=bursts,
+        age_counts=[int(value) for value in age_counts],
+        median_age_days=float(np.median(age_days)) if count else 0.0,
+        cluster_start=cluster_start,
+        cluster_size=cluster_size,
+    )
@@ -6,27 +6,116 @@
 
 import discord
 
-from redbot.core import commands, checks
-from redbot.core.utils.chat_formatting import pagify, escape
-from redbot.core.utils.menus import menu, DEFAULT_CONTROLS
+from redbot.core import commands, checks, Config
+from redbot.core.data_manager import cog_data_path
 
+import asyncio
 import datetime
+import logging
+import time
+from typing import Dict, Optional
+
+from .index import JoinIndex, members_joined_since
+from .journal import FLUSH_INTERVAL, JOIN, LEAVE, JoinJournal
+from .menus import FreshmeatMenu, MemberPageSource
+
+log = logging.getLogger("red.freshmeat")
 
 BaseCog = getattr(commands, "Cog", object)
 
 
+# Longest window without a journal, and with one.
+MAX_HOURS = 300
+MAX_JOURNAL_HOURS = 24 * 365
+
+
 class Freshmeat(BaseCog):
 
     def __init__(self, bot):
         self.bot = bot
+        self.config = Config.get_conf(self, identifier=25360012)
+        self.config.register_guild(journal=False)
+        # guild_id -> join index, built on first use
+        self.join_indexes: Dict[int, JoinIndex] = {}
+        # guild_id -> journal, only for the guilds that enabled it
+        self.journals: Dict[int, JoinJournal] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        # set when a journal has enough buffered records to be flushed before the interval is up
+        self._flush_requested = asyncio.Event()
+
+    async def initialize(self):
+        for guild_id, guild_data in (await self.config.all_guilds()).items():
+            if guild_data["journal"]:
+                journal = self.journals[guild_id] = JoinJournal(self._journal_path(guild_id))
+                await journal.load()
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    def cog_unload(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+        for journal in self.journals.values():
+            journal.flush_nowait()
+
+    def _journal_path(self, guild_id: int):
+        return cog_data_path(self) / "journals" / f"{guild_id}.bin"
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            for journal in list(self.journals.values()):
+                try:
+                    await journal.flush()
+                except OSError as e:
+                    log.error("Failed to write the join journal %s: %s", journal.path, e)
+
+    def _journal_append(self, guild_id: int, kind: int, timestamp: float, member_id: int) -> None:
+        journal = self.journals.get(guild_id)
+        if journal is not None and journal.append(kind, timestamp, member_id):
+            self._flush_requested.set()
+
+    def get_join_index(self, guild: discord.Guild) -> Optional[JoinIndex]:
+        """Get the join index of the guild, there's none when its member list isn't complete."""
+        index = self.join_indexes.get(guild.id)
+        # only a complete member list can be kept up to date with member events
+        if index is None and guild.chunked:
+            index = self.join_indexes[guild.id] = JoinIndex(guild.members)
+        return index
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        index = self.join_indexes.get(member.guild.id)
+        if index is not None:
+            index.add(member)
+        joined_at = member.joined_at or discord.utils.utcnow()
+        self._journal_append(member.guild.id, JOIN, joined_at.timestamp(), member.id)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        index = self.join_indexes.get(member.guild.id)
+        if index is not None:
+            index.remove(member.id)
+
+    @commands.Cog.listener()
+    async def on_raw_member_remove(self, payload):
+        # raw, so that leaves are journaled even when the member isn't cached
+        self._journal_append(payload.guild_id, LEAVE, time.time(), payload.user.id)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.join_indexes.pop(guild.id, None)
 
     async def red_get_data_for_user(self, **kwargs):
         return {}
 
-    async def red_delete_data_for_user(self, **kwargs):
-        return
+    async def red_delete_data_for_user(self, *, requester, user_id):
+        for journal in list(self.journals.values()):
+            await journal.purge_member(user_id)
 
-    @commands.command()
+    @commands.group(invoke_without_command=True)
     @commands.guild_only()
     @commands.bot_has_permissions(embed_links=True)
     @checks.admin_or_permissions(kick_members=True)
@@ -34,46 +123,128 @@ class Freshmeat(BaseCog):
         """Show the members who joined in the specified timeframe
 
         `hours`: A number of hours to check for new members, must be above 0"""
+        journal = self.journals.get(ctx.guild.id)
+        max_hours = MAX_HOURS if journal is None else MAX_JOURNAL_HOURS
         if hours < 1:
             return await ctx.send("Consider putting hours above 0. Since that helps with searching for members. ;)")
-        elif hours > 300:
-            return await ctx.send("Please use something less then 300 hours.")
-
-        member_list = []
-        for member in ctx.guild.members:
-            if (
-                member.joined_at is not None
-                and member.joined_at > (ctx.message.created_at - datetime.timedelta(hours=hours))
-            ):
-                member_list.append([member.display_name, member.id, member.joined_at])
-
-        member_list.sort(key=lambda member: member[2], reverse=True)
-        member_string = ""
-        for member in member_list:
-            member_string += f"\n{member[0]} ({member[1]})"
-
-        pages = []
-        for page in pagify(escape(member_string, formatting=True), page_length=1000):
-            embed = discord.Embed(description=page)
-            embed.set_author(
-                name=f"{ctx.author.display_name}'s freshmeat of the day.",
-                icon_url=ctx.author.display_avatar,
-            )
-            pages.append(embed)
+        elif hours > max_hours:
+            return await ctx.send(f"Please use something less then {max_hours} hours.")
 
-        page_counter = 1
-        for page in pages:
-            page.set_footer(text=f"Page {page_counter} out of {len(pages)}")
-            page_counter += 1
-
-        if not pages:
+        since = ctx.message.created_at - datetime.timedelta(hours=hours)
+        joined = await self._joined_since(ctx.guild, since)
+        member_ids = [member_id for _, member_id in joined]
+        if not member_ids:
             return await ctx.send("No new members joined in specified timeframe.")
 
-        await menu(
-            ctx,
-            pages=pages,
-            controls=DEFAULT_CONTROLS,
-            message=None,
-            page=0,
-            timeout=90
+        await FreshmeatMenu(MemberPageSource(ctx.guild, ctx.author, member_ids), timeout=90).start(ctx)
+
+    async def _joined_since(self, guild: discord.Guild, since: datetime.datetime):
+        journal = self.journals.get(guild.id)
+        if journal is not None:
+            return await journal.members_since(since.timestamp())
+        index = self.get_join_index(guild)
+        if index is None:
+            return members_joined_since(guild.members, since)
+        return index.joined_since(since)
+
+    @freshmeat.command()
+    async def analytics(self, ctx, hours: int = 24):
+        """Look for join waves and new account clusters in the specified timeframe
+
+        NumPy has to be installed for this, it's not installed with the cog.
+
+        `hours`: A number of hours to analyse, must be above 0"""
+        try:
+            # NumPy is only needed here, the rest of the cog works without it
+            from .analytics import AGE_LABELS, CLUSTER_SECONDS, NEW_ACCOUNT_DAYS, analyse
+        except ImportError:
+            return await ctx.send(f"Analytics need NumPy, install it with ``{ctx.clean_prefix}pipinstall numpy``.")
+        max_hours = MAX_HOURS if ctx.guild.id not in self.journals else MAX_JOURNAL_HOURS
+        if hours < 1:
+            return await ctx.send("Consider putting hours above 0. Since that helps with searching for members. ;)")
+        elif hours > max_hours:
+            return await ctx.send(f"Please use something less then {max_hours} hours.")
+
+        until = ctx.message.created_at
+        since = until - datetime.timedelta(hours=hours)
+        joined = await self._joined_since(ctx.guild, since)
+        if not joined:
+            return await ctx.send("No new members joined in specified timeframe.")
+        waves = analyse(joined, since.timestamp(), until.timestamp())
+
+        embed = discord.Embed(
+            title=f"Joins in the last {hours} hours",
+            description=(
+                f"``{waves.joins}`` members joined, that's ``{waves.joins / waves.minutes:.2f}`` per minute.\n"
+                f"The busiest minute had ``{waves.peak_joins}`` joins "
+                f"(<t:{int(waves.peak_minute)}:f>)."
+            ),
+        )
+        if waves.bursts:
+            largest = sorted(waves.bursts, key=lambda burst: burst[2], reverse=True)[:10]
+            bursts = [
+                f"<t:{int(start)}:f> - <t:{int(end)}:t>: ``{joins}`` joins"
+                for start, end, joins in largest
+            ]
+            if len(waves.bursts) > 10:
+                bursts.append(f"...and ``{len(waves.bursts) - 10}`` more.")
+            value = "\n".join(bursts)
+        else:
+            value = "None"
+        embed.add_field(
+            name=f"Bursts (minutes with {waves.burst_threshold:.0f}+ joins)", value=value, inline=False
         )
+        embed.add_field(
+            name="Account age when joining",
+            value="\n".join(
+                f"{label}: ``{count}``" for label, count in zip(AGE_LABELS, waves.age_counts)
+            )
+            + f"\nMedian: ``{waves.median_age_days:.1f}`` days",
+            inline=False,
+        )
+        if waves.cluster_size > 1:
+            embed.add_field(
+                name=f"Accounts younger than {NEW_ACCOUNT_DAYS} days",
+                value=(
+                    f"``{waves.cluster_size}`` of them were created within the same "
+                    f"{CLUSTER_SECONDS // 60} minutes (<t:{int(waves.cluster_start)}:f>)."
+                ),
+                inline=False,
+            )
+        await ctx.send(embed=embed)
+
+    @freshmeat.command()
+    @checks.admin_or_permissions(manage_guild=True)
+    async def journal(self, ctx, true_or_false: bool):
+        """Keep a journal of joins and leaves on disk
+
+        With the journal, freshmeat doesn't need the member list of the server
+        and can look back further than 300 hours.
+        Turning it on fills it with the current members,
+        turning it off deletes it."""
+        journal = self.journals.get(ctx.guild.id)
+        if true_or_false:
+            if journal is not None:
+                return await ctx.send("The journal is already on.")
+            journal = JoinJournal(self._journal_path(ctx.guild.id))
+            await journal.delete()  # leftovers of an earlier journal would be out of date
+            if not ctx.guild.chunked:
+                await ctx.guild.chunk()
+            # Registered before the members are added, so joins and leaves from here on
+            # are appended after them, the member list already has the ones from before.
+            self.journals[ctx.guild.id] = journal
+            for member in sorted(
+                (member for member in ctx.guild.members if member.joined_at is not None),
+                key=lambda member: member.joined_at,
+            ):
+                journal.append(JOIN, member.joined_at.timestamp(), member.id)
+            await journal.flush()
+            await self.config.guild(ctx.guild).journal.set(True)
+            await ctx.send(f"Done! Turned on the journal with ``{journal.records}`` members.")
+        else:
+            if journal is None:
+                return await ctx.send("The journal is already off.")
+            del self.journals[ctx.guild.id]
+            await journal.delete()
+            await self.config.guild(ctx.guild).journal.set(False)
+            await ctx.send("Done! Turned off the journal and deleted it.")
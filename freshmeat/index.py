@@ -0,0 +1,69 @@
+"""
+  This Source Code Form is subject to the terms of the Mozilla Public
+  License, v. 2.0. If a copy of the MPL was not distributed with this
+  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import bisect
+import datetime
+from typing import Dict, Iterable, List, Tuple
+
+import discord
+
+
+class JoinIndex:
+    """The members of a guild sorted by the time they joined.
+
+    Entries are ``(joined_at timestamp, member ID)`` tuples,
+    kept sorted with bisect so window queries only touch the matching members.
+    """
+
+    def __init__(self, members: Iterable[discord.Member] = ()) -> None:
+        self._entries: List[Tuple[float, int]] = sorted(
+            (member.joined_at.timestamp(), member.id)
+            for member in members
+            if member.joined_at is not None
+        )
+        # member ID -> joined_at timestamp, to find the entry of a member that left
+        self._joined: Dict[int, float] = {member_id: joined for joined, member_id in self._entries}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, member: discord.Member) -> None:
+        if member.joined_at is None:
+            return
+        self.remove(member.id)
+        joined = member.joined_at.timestamp()
+        bisect.insort(self._entries, (joined, member.id))
+        self._joined[member.id] = joined
+
+    def remove(self, member_id: int) -> None:
+        joined = self._joined.pop(member_id, None)
+        if joined is None:
+            return
+        idx = bisect.bisect_left(self._entries, (joined, member_id))
+        if idx < len(self._entries) and self._entries[idx] == (joined, member_id):
+            del self._entries[idx]
+
+    def joined_since(self, since: datetime.datetime) -> List[Tuple[float, int]]:
+        """Get the entries of the members who joined after ``since``, newest first."""
+        idx = bisect.bisect_right(self._entries, (since.timestamp(), float("inf")))
+        return self._entries[:idx - 1:-1] if idx else self._entries[::-1]
+
+
+def members_joined_since(
+    members: Iterable[discord.Member], since: datetime.datetime
+) -> List[Tuple[float, int]]:
+    """Like `JoinIndex.joined_since`, for a member list there's no index of.
+
+    Only the members in the window get sorted, cheaper than indexing them all for one query.
+    """
+    return sorted(
+        (
+            (member.joined_at.timestamp(), member.id)
+            for member in members
+            if member.joined_at is not None and member.joined_at > since
+        ),
+        reverse=True,
+    )
@@ -0,0 +1,187 @@
+"""
+  This Source Code Form is subject to the terms of the Mozilla Public
+  License, v. 2.0. If a copy of the MPL was not distributed with this
+  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import asyncio
+import bisect
+import logging
+import os
+import struct
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+log = logging.getLogger("red.freshmeat.journal")
+
+# kind, timestamp, member ID
+RECORD = struct.Struct("<BdQ")
+JOIN = 1
+LEAVE = 2
+# Every this many records the timestamp and offset of a record go into the time index.
+INDEX_STRIDE = 1024
+# Pending records are written once there are this many, or by the periodic flush.
+FLUSH_THRESHOLD = 256
+FLUSH_INTERVAL = 5.0
+
+
+class JoinJournal:
+    """Append-only on-disk log of the joins and leaves of a guild.
+
+    Timestamps are clamped to never go backwards, so the file stays sorted by time
+    and the sparse time index can be bisected to find where a window starts.
+    Records are buffered and appended in batches from a thread.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._pending: List[bytes] = []
+        self._records = 0
+        self._last_timestamp = 0.0
+        # (timestamp, offset) of every INDEX_STRIDE-th record
+        self._index: List[Tuple[float, int]] = []
+        self._lock = asyncio.Lock()
+        # flush left running by flush_nowait
+        self._flush_task: Optional[asyncio.Task] = None
+
+    @property
+    def records(self) -> int:
+        return self._records + len(self._pending)
+
+    async def load(self) -> None:
+        """Build the time index by reading only the indexed records of the file."""
+        self._index, self._records, self._last_timestamp = await asyncio.to_thread(
+            self._read_index
+        )
+
+    def _read_index(self) -> Tuple[List[Tuple[float, int]], int, float]:
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            return [], 0, 0.0
+        records = size // RECORD.size
+        index = []
+        last_timestamp = 0.0
+        with self.path.open("rb") as fp:
+            for record in range(0, records, INDEX_STRIDE):
+                offset = record * RECORD.size
+                fp.seek(offset)
+                _, timestamp, _ = RECORD.unpack(fp.read(RECORD.size))
+                index.append((timestamp, offset))
+            if records:
+                fp.seek((records - 1) * RECORD.size)
+                _, last_timestamp, _ = RECORD.unpack(fp.read(RECORD.size))
+        if size % RECORD.size:
+            # a write was cut off, the partial record gets overwritten by the next flush
+            log.warning("Ignoring a partial record at the end of %s", self.path)
+        return index, records, last_timestamp
+
+    def append(self, kind: int, timestamp: float, member_id: int) -> bool:
+        """Buffer a record, returns whether the buffer should be flushed."""
+        timestamp = max(timestamp, self._last_timestamp)
+        self._last_timestamp = timestamp
+        self._pending.append(RECORD.pack(kind, timestamp, member_id))
+        return len(self._pending) >= FLUSH_THRESHOLD
+
+    async def flush(self) -> None:
+        async with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+            offset = self._records * RECORD.size
+            try:
+                await asyncio.to_thread(self._write, offset, b"".join(pending))
+            except BaseException:
+                self._pending[:0] = pending  # retried by the next flush
+                raise
+            self._commit(pending)
+
+    def flush_nowait(self) -> None:
+        """Write the buffered records, for use in ``cog_unload``.
+
+        They're written right away, unless a flush is in progress,
+        then they're written by another flush once that one is done.
+        """
+        if not self._pending:
+            return
+        if self._lock.locked():
+            self._flush_task = asyncio.create_task(self.flush())
+            self._flush_task.add_done_callback(self._log_flush_error)
+            return
+        pending, self._pending = self._pending, []
+        self._write(self._records * RECORD.size, b"".join(pending))
+        self._commit(pending)
+
+    def _log_flush_error(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            log.error("Failed to write the join journal %s: %s", self.path, task.exception())
+
+    def _write(self, offset: int, data: bytes) -> None:
+        # Only the file is touched here, this runs in a thread.
+        # A partial record left at the end by an interrupted write is shorter than a record,
+        # so it's always overwritten entirely.
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("r+b" if self.path.exists() else "wb") as fp:
+            fp.seek(offset)
+            fp.write(data)
+
+    def _commit(self, written: List[bytes]) -> None:
+        """Account for written records, while nothing else is writing."""
+        offset = self._records * RECORD.size
+        for idx, record in enumerate(written):
+            if (self._records + idx) % INDEX_STRIDE == 0:
+                _, timestamp, _ = RECORD.unpack(record)
+                self._index.append((timestamp, offset + idx * RECORD.size))
+        self._records += len(written)
+
+    async def members_since(self, since: float) -> List[Tuple[float, int]]:
+        """Get ``(joined timestamp, member ID)`` of the members who joined after ``since``
+        and haven't left since, newest first."""
+        await self.flush()
+        async with self._lock:
+            # the indexed record before the window, all records after it are read
+            idx = bisect.bisect_left(self._index, (since, -1)) - 1
+            offset = self._index[idx][1] if idx >= 0 else 0
+            end = self._records * RECORD.size
+            data = await asyncio.to_thread(self._read, offset, end)
+        members: Dict[int, float] = {}
+        for kind, timestamp, member_id in RECORD.iter_unpack(data):
+            if kind == JOIN:
+                if timestamp > since:
+                    members[member_id] = timestamp
+            else:
+                members.pop(member_id, None)
+        return sorted(((joined, member_id) for member_id, joined in members.items()), reverse=True)
+
+    def _read(self, offset: int, end: int) -> bytes:
+        if end <= offset:
+            return b""
+        with self.path.open("rb") as fp:
+            fp.seek(offset)
+            return fp.read(end - offset)
+
+    async def purge_member(self, member_id: int) -> None:
+        """Rewrite the journal without the records of the member."""
+        await self.flush()
+        async with self._lock:
+            await asyncio.to_thread(self._purge, member_id)
+            self._index, self._records, self._last_timestamp = await asyncio.to_thread(
+                self._read_index
+            )
+
+    def _purge(self, member_id: int) -> None:
+        data = self._read(0, self._records * RECORD.size)
+        kept = b"".join(
+            RECORD.pack(*record) for record in RECORD.iter_unpack(data) if record[2] != member_id
+        )
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_bytes(kept)
+        os.replace(tmp_path, self.path)
+
+    async def delete(self) -> None:
+        async with self._lock:
+            self._pending.clear()
+            self._index.clear()
+            self._records = 0
+            self._last_timestamp = 0.0
+            await asyncio.to_thread(self.path.unlink, missing_ok=True)
@@ -0,0 +1,58 @@
+"""
+  This Source Code Form is subject to the terms of the Mozilla Public
+  License, v. 2.0. If a copy of the MPL was not distributed with this
+  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+from typing import Any, Dict, List, Sequence
+
+import discord
+from redbot.core.utils.chat_formatting import escape
+from redbot.core.utils.views import SimpleMenu
+from redbot.vendored.discord.ext import menus
+
+# Each line is at most a 32 character name (escaped) and an ID, this keeps pages well within embed limits.
+MEMBERS_PER_PAGE = 20
+
+
+class MemberPageSource(menus.ListPageSource):
+    """Pages of member IDs, formatted only when they're shown."""
+
+    def __init__(self, guild: discord.Guild, author: discord.abc.User, member_ids: Sequence[int]):
+        super().__init__(member_ids, per_page=MEMBERS_PER_PAGE)
+        self.guild = guild
+        self.author = author
+
+    async def format_page(self, menu: SimpleMenu, member_ids: List[int]) -> discord.Embed:
+        lines = []
+        for member_id in member_ids:
+            member = self.guild.get_member(member_id)
+            if member is None:
+                # not cached, e.g. when it's coming from the journal
+                lines.append(f"<@{member_id}> ({member_id})")
+            else:
+                lines.append(f"{escape(member.display_name, formatting=True)} ({member_id})")
+        embed = discord.Embed(description="\n".join(lines))
+        embed.set_author(
+            name=f"{self.author.display_name}'s freshmeat of the day.",
+            icon_url=self.author.display_avatar,
+        )
+        embed.set_footer(text=f"Page {menu.current_page + 1} out of {self.get_max_pages()}")
+        return embed
+
+
+class FreshmeatMenu(SimpleMenu):
+    """`SimpleMenu` whose pages are rendered by a `MemberPageSource` only when they're shown."""
+
+    def __init__(self, source: MemberPageSource, **kwargs) -> None:
+        # SimpleMenu only gets a placeholder per page, which it uses for navigation
+        super().__init__(range(source.get_max_pages()), **kwargs)
+        self.member_source = source
+
+    async def get_page(self, page_num: int) -> Dict[str, Any]:
+        # going back from the first page shows the last one, like other menus
+        page_num %= self.member_source.get_max_pages()
+        self.current_page = page_num
+        member_ids = await self.member_source.get_page(page_num)
+        embed = await self.member_source.format_page(self, member_ids)
+        return {"view": self, "embed": embed, "content": None}
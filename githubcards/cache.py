@@ -0,0 +1,237 @@
+"""
+  This Source Code Form is subject to the terms of the Mozilla Public
+  License, v. 2.0. If a copy of the MPL was not distributed with this
+  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Mapping, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+log = logging.getLogger("red.githubcards.cache")
+
+# How long the fetched issue and pull request data is kept, in seconds.
+ISSUE_TTL = 300
+# How long search results are kept, in seconds.
+SEARCH_TTL = 60
+# How long issues that can't be fetched (not found, no access) are remembered, in seconds.
+NEGATIVE_TTL = 120
+# Max size of a single line in the shared cache protocol, issue bodies can get big.
+_STREAM_LIMIT = 2 ** 24
+# How long a request to the shared cache host may take before it's given up on, in seconds.
+_REQUEST_TIMEOUT = 0.5
+
+
+def issue_key(owner: str, repo: str, number: int) -> str:
+    return f"issue:{owner}/{repo}#{number}".lower()
+
+
+def search_key(query: str, after: Optional[str] = None) -> str:
+    return f"search:{query}" if after is None else f"search:{query}@{after}"
+
+
+class CacheBackend:
+    """Interface of the GitHubCards cache.
+
+    Values have to be JSON serializable, since they might be sent to another process.
+    Backends never raise on lookups, a broken backend behaves like an empty cache.
+    """
+
+    shared = False
+
+    async def get_many(self, keys: Iterable[str], *, stale: bool = False) -> Dict[str, Any]:
+        """Get the values of the given keys, keys that are missing are left out.
+
+        Expired values are left out as well, unless ``stale`` is set.
+        Those are kept around until evicted, to serve as a fallback while GitHub is unavailable.
+        """
+        raise NotImplementedError
+
+    async def set_many(self, items: Mapping[str, Any], ttl: float) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU cache with per entry expiry."""
+
+    def __init__(self, max_entries: int = 4096) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, Tuple[float, Any]] = OrderedDict()
+
+    def get_many_nowait(self, keys: Iterable[str], *, stale: bool = False) -> Dict[str, Any]:
+        now = time.monotonic()
+        found = {}
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            expires_at, value = entry
+            if expires_at < now and not stale:
+                continue
+            self._entries.move_to_end(key)
+            found[key] = value
+        return found
+
+    def set_many_nowait(self, items: Mapping[str, Any], ttl: float) -> None:
+        expires_at = time.monotonic() + ttl
+        for key, value in items.items():
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_many(self, keys: Iterable[str], *, stale: bool = False) -> Dict[str, Any]:
+        return self.get_many_nowait(keys, stale=stale)
+
+    async def set_many(self, items: Mapping[str, Any], ttl: float) -> None:
+        self.set_many_nowait(items, ttl)
+
+
+class SharedCache(CacheBackend):
+    """Cache shared by the bot processes on one host over a Unix domain socket.
+
+    The process holding the lock file next to the socket hosts the cache in memory,
+    every other process talks to it using newline delimited JSON.
+    When the host goes away, the next process to notice takes over.
+    """
+
+    shared = True
+
+    def __init__(self, path: str, *, max_entries: int = 4096) -> None:
+        if fcntl is None:
+            raise RuntimeError("The shared cache is only supported on Unix systems.")
+        self.path = path
+        self._local = MemoryCache(max_entries)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._lock_file = None
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._clients: Set[asyncio.StreamWriter] = set()
+        self._io_lock = asyncio.Lock()
+
+    @property
+    def is_host(self) -> bool:
+        return self._server is not None
+
+    def _try_become_host(self) -> bool:
+        lock_file = open(os.open(f"{self.path}.lock", os.O_WRONLY | os.O_CREAT, 0o600), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    async def _connect(self) -> None:
+        if self.is_host or (self._writer is not None and not self._writer.is_closing()):
+            return
+        if self._try_become_host():
+            try:
+                os.unlink(self.path)  # left behind by a previous host
+            except FileNotFoundError:
+                pass
+            self._server = await asyncio.start_unix_server(
+                self._handle_client, path=self.path, limit=_STREAM_LIMIT, start_serving=False
+            )
+            # There's no authentication, so only processes of the same user may connect.
+            os.chmod(self.path, 0o600)
+            await self._server.start_serving()
+            log.info("Hosting the shared cache at %s", self.path)
+            return
+        self._reader, self._writer = await asyncio.open_unix_connection(
+            self.path, limit=_STREAM_LIMIT
+        )
+
+    def _handle_request(self, request: Mapping[str, Any]) -> Dict[str, Any]:
+        if request["op"] == "get":
+            return {
+                "values": self._local.get_many_nowait(request["keys"], stale=request.get("stale", False))
+            }
+        if request["op"] == "set":
+            self._local.set_many_nowait(request["items"], request["ttl"])
+            return {}
+        raise ValueError(f"Unknown operation: {request['op']}")
+
+    async def _handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self._clients.add(writer)
+        try:
+            while line := await reader.readline():
+                response = self._handle_request(json.loads(line))
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, ValueError, KeyError, TypeError, AttributeError) as e:
+            # malformed requests included
+            log.debug("Dropping shared cache client: %s", e)
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+
+    async def _request(self, request: Mapping[str, Any]) -> Dict[str, Any]:
+        async with self._io_lock:
+            try:
+                await self._connect()
+                if self.is_host:
+                    return self._handle_request(request)
+                # a stalled host mustn't stall this process
+                return await asyncio.wait_for(self._round_trip(request), _REQUEST_TIMEOUT)
+            except (OSError, ValueError, asyncio.TimeoutError) as e:
+                log.debug("Shared cache request failed: %s", e)
+                await self._disconnect()
+                return {}
+            except asyncio.CancelledError:
+                # the reply to this request could still arrive and be read as the next one's
+                await self._disconnect()
+                raise
+
+    async def _round_trip(self, request: Mapping[str, Any]) -> Dict[str, Any]:
+        self._writer.write(json.dumps(request).encode() + b"\n")
+        await self._writer.drain()
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionResetError("The shared cache host closed the connection.")
+        response = json.loads(line)
+        if not isinstance(response, dict):
+            raise ValueError(f"Malformed response from the shared cache host: {line!r}")
+        return response
+
+    async def _disconnect(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def get_many(self, keys: Iterable[str], *, stale: bool = False) -> Dict[str, Any]:
+        response = await self._request({"op": "get", "keys": list(keys), "stale": stale})
+        return response.get("values", {})
+
+    async def set_many(self, items: Mapping[str, Any], ttl: float) -> None:
+        await self._request({"op": "set", "items": dict(items), "ttl": ttl})
+
+    async def close(self) -> None:
+        await self._disconnect()
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            for writer in self._clients:
+                writer.close()
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
@@ -101,9 +101,13 @@ class Queries:
     }"""
 
     searchIssues = """
-        query SearchIssues($query: String!) {
-            search(type: ISSUE, query: $query, first: 15) {
+        query SearchIssues($query: String!, $first: Int!, $after: String) {
+            search(type: ISSUE, query: $query, first: $first, after: $after) {
                 issueCount
+                pageInfo {
+                    endCursor
+                    hasNextPage
+                }
                 nodes {
                     __typename
                     ... on Issue {
@@ -130,6 +134,119 @@ class Queries:
             }
         }"""
 
+    mirrorIssues = """
+        query MirrorIssues($repoOwner: String!, $repoName: String!, $after: String, $since: DateTime) {
+            repository(owner: $repoOwner, name: $repoName) {
+                issues(
+                    first: 100,
+                    after: $after,
+                    orderBy: {field: UPDATED_AT, direction: DESC},
+                    filterBy: {since: $since}
+                ) {
+                    pageInfo {
+                        endCursor
+                        hasNextPage
+                    }
+                    nodes {
+                        __typename
+                        number
+                        title
+                        body
+                        url
+                        createdAt
+                        updatedAt
+                        state
+                        milestone {
+                            title
+                        }
+                        author {
+                            login
+                            avatarUrl
+                            url
+                        }
+                        repository {
+                            nameWithOwner
+                        }
+                        labels(first:100) {
+                            nodes {
+                                name
+                            }
+                        }
+                    }
+                }
+            }
+            rateLimit {
+                cost
+                remaining
+                limit
+                resetAt
+            }
+        }"""
+
+    mirrorPullRequests = """
+        query MirrorPullRequests($repoOwner: String!, $repoName: String!, $after: String) {
+            repository(owner: $repoOwner, name: $repoName) {
+                pullRequests(
+                    first: 100,
+                    after: $after,
+                    orderBy: {field: UPDATED_AT, direction: DESC}
+                ) {
+                    pageInfo {
+                        endCursor
+                        hasNextPage
+                    }
+                    nodes {
+                        __typename
+                        number
+                        title
+                        body
+                        url
+                        createdAt
+                        updatedAt
+                        state
+                        isDraft
+                        milestone {
+                            title
+                        }
+                        author {
+                            login
+                            avatarUrl
+                            url
+                        }
+                        repository {
+                            nameWithOwner
+                        }
+                        labels(first:100) {
+                            nodes {
+                                name
+                            }
+                        }
+                    }
+                }
+            }
+            rateLimit {
+                cost
+                remaining
+                limit
+                resetAt
+            }
+        }"""
+
+    findMergeable = """
+        query FindMergeable($repoOwner: String!, $repoName: String!, $number: Int!) {
+            repository(owner: $repoOwner, name: $repoName) {
+                pullRequest(number: $number) {
+                    mergeable
+                }
+            }
+            rateLimit {
+                cost
+                remaining
+                limit
+                resetAt
+            }
+        }"""
+
 
 class Mutations:
     """Prebuild GraphQL mutation calls"""
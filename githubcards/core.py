@@ -5,26 +5,60 @@
 """
 
 import asyncio
+import dataclasses
+import functools
 import logging
 import re
-from typing import Any, Dict, Mapping, Optional
+import time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
+import aiohttp
 import discord
 from redbot.core import Config, checks, commands
 
+from .cache import (
+    ISSUE_TTL,
+    NEGATIVE_TTL,
+    SEARCH_TTL,
+    CacheBackend,
+    MemoryCache,
+    SharedCache,
+    issue_key,
+    search_key,
+)
 from .converters import RepoData
-from .exceptions import ApiError, Unauthorized
+from .data import IssueData, SearchData
+from .exceptions import ApiError, Unauthorized, Unavailable
 from .formatters import FetchableReposDict, Formatters, Query
-from .http import GitHubAPI
+from .http import GitHubAPI, backoff_delay
+from .mirror import SYNC_INTERVAL, RepositoryMirror
+from .pressure import CardMode, LoadController
+from .recent import MAX_WINDOW, RecentCards
+from .views import SearchMenu
 
 log = logging.getLogger("red.githubcards.core")
 
+# Core commands after which the cached per-guild cog state has to be thrown away.
+COG_TOGGLE_COMMANDS = frozenset(
+    (
+        "command disablecog",
+        "command enablecog",
+        "command defaultdisablecog",
+        "command defaultenablecog",
+    )
+)
+# How long the cached per-guild cog state is trusted anyway, in seconds.
+DISABLED_CACHE_TTL = 300
+# The first query plus one follow-up for the aliases that failed transiently.
+QUERY_ATTEMPTS = 2
+
 
 """
 {
     "prefix slug": {
         "owner": "Cog-Creators",
         "repo": "Red-DiscordBot",
+        "mirror": False,
     }
 }
 """
@@ -42,17 +76,42 @@ class GitHubCards(commands.Cog):
             "REPO",  # + 2 identifiers: (guild_id, prefix)
             owner=None,
             repo=None,
+            mirror=False,
+        )
+        self.config.register_global(
+            cache_backend="memory",
+            cache_socket=None,
+        )
+        self.config.register_guild(
+            dedupe_window=0,
+            dedupe_mode="link",
         )
         self.active_prefix_matchers = {}
+        self.mirrors: Dict[Tuple[str, str], RepositoryMirror] = {}
         self.splitter = re.compile(r"[!?().,;:+|&/`\s]")
         self._ready = asyncio.Event()
         self.http: GitHubAPI = None  # assigned in initialize()
+        self._mirror_task: Optional[asyncio.Task] = None
+        self.cache: CacheBackend = MemoryCache()
+        self.load_controller = LoadController()
+        # guild_id -> (whether the cog is disabled there, when that was checked)
+        self._disabled_in_guild: Dict[int, Tuple[bool, float]] = {}
+        # guild_id -> (duplicate suppression window in seconds, "link" or "silent")
+        self._dedupe_settings: Dict[int, Tuple[int, str]] = {}
+        self.recent_cards = RecentCards()
 
     async def initialize(self):
         """ cache preloading """
         await self.rebuild_cache_for_guild()
         await self._create_client()
+        await self._create_cache()
+        self._dedupe_settings = {
+            guild_id: (settings["dedupe_window"], settings["dedupe_mode"])
+            for guild_id, settings in (await self.config.all_guilds()).items()
+            if settings["dedupe_window"]
+        }
         self._ready.set()
+        self._mirror_task = asyncio.create_task(self._mirror_loop())
 
     async def rebuild_cache_for_guild(self, *guild_ids):
         self._ready.clear()
@@ -62,10 +121,23 @@ class GitHubCards(commands.Cog):
             if guild_ids:
                 data = {k: v for k, v in data.items() if k in guild_ids}
 
+            for guild_id in guild_ids:
+                if not data.get(guild_id):
+                    # all prefixes of this guild were removed
+                    self.active_prefix_matchers.pop(guild_id, None)
+
             for guild_id, guild_data in data.items():
+                if not guild_data:
+                    continue
                 partial = "|".join(re.escape(prefix) for prefix in guild_data.keys())
                 pattern = re.compile(rf"^({partial})#([0-9]+)$", re.IGNORECASE)
-                self.active_prefix_matchers[int(guild_id)] = {"pattern": pattern, "data": guild_data}
+                self.active_prefix_matchers[int(guild_id)] = {
+                    "pattern": pattern,
+                    "data": guild_data,
+                    # shortest possible reference, ``prefix#1``
+                    "min_length": min(len(prefix) for prefix in guild_data.keys()) + 2,
+                }
+            self._refresh_mirrors()
         finally:
             self._ready.set()
 
@@ -73,7 +145,37 @@ class GitHubCards(commands.Cog):
         await self._ready.wait()
 
     def cog_unload(self):
+        if self._mirror_task is not None:
+            self._mirror_task.cancel()
         self.bot.loop.create_task(self.http.session.close())
+        self.bot.loop.create_task(self.cache.close())
+
+    def _refresh_mirrors(self) -> None:
+        """Sync the mirror objects with the repositories that have mirroring enabled."""
+        wanted = {
+            (repo_data["owner"], repo_data["repo"])
+            for matcher in self.active_prefix_matchers.values()
+            for repo_data in matcher["data"].values()
+            if repo_data.get("mirror")
+        }
+        for key in wanted - self.mirrors.keys():
+            self.mirrors[key] = RepositoryMirror(*key)
+        for key in self.mirrors.keys() - wanted:
+            del self.mirrors[key]
+
+    async def _mirror_loop(self) -> None:
+        await self.bot.wait_until_red_ready()
+        while True:
+            for mirror in list(self.mirrors.values()):
+                try:
+                    await mirror.sync(self.http)
+                except (ApiError, aiohttp.ClientError) as e:
+                    log.warning("Failed to sync the mirror of %s/%s: %s", mirror.owner, mirror.repo, e)
+                except Exception:
+                    log.exception(
+                        "Unexpected error while syncing the mirror of %s/%s", mirror.owner, mirror.repo
+                    )
+            await asyncio.sleep(SYNC_INTERVAL)
 
     async def red_get_data_for_user(self, **kwargs):
         return {}
@@ -95,6 +197,18 @@ class GitHubCards(commands.Cog):
         """Create GitHub API client."""
         self.http = GitHubAPI(token=await self._get_token())
 
+    async def _create_cache(self) -> None:
+        """Create the cache backend set in the config."""
+        await self.cache.close()
+        settings = await self.config.all()
+        if settings["cache_backend"] == "shared" and settings["cache_socket"]:
+            try:
+                self.cache = SharedCache(settings["cache_socket"])
+                return
+            except RuntimeError as e:
+                log.error("Falling back to the in-process cache: %s", e)
+        self.cache = MemoryCache()
+
     @commands.guild_only()
     @commands.command(usage="<prefix> <search_query>")
     async def ghsearch(self, ctx, repo_data: RepoData, *, search_query: str):
@@ -102,11 +216,51 @@ class GitHubCards(commands.Cog):
 
         Protip: You can also search issues via ``prefix#s <search_query>``!"""
         async with ctx.channel.typing():
-            search_data = await self.http.search_issues(
-                repo_data["owner"], repo_data["repo"], search_query
+            search_data = await self._search(repo_data["owner"], repo_data["repo"], search_query)
+            if search_data is None:
+                await ctx.send("GitHub is unavailable right now, please try again later.")
+                return
+            await self._send_search_menu(
+                ctx, ctx.author, repo_data["owner"], repo_data["repo"], search_query, search_data
             )
-            embed = Formatters.format_search(search_data)
-            await ctx.send(embed=embed)
+
+    async def _send_search_menu(
+        self,
+        destination: discord.abc.Messageable,
+        author: discord.abc.User,
+        owner: str,
+        repo: str,
+        search_query: str,
+        search_data: SearchData,
+    ) -> None:
+        """Send the first page of the search results, with a menu if there are more pages."""
+        menu = SearchMenu(
+            search_data, functools.partial(self._search, owner, repo, search_query), author=author
+        )
+        if not menu.is_paginating:
+            await destination.send(embed=menu.current_embed())
+            return
+        menu.message = await destination.send(embed=menu.current_embed(), view=menu)
+
+    async def _search(
+        self, owner: str, repo: str, search_query: str, after: Optional[str] = None
+    ) -> Optional[SearchData]:
+        """Search issues, falling back to stale results while GitHub is unavailable.
+
+        ``after`` is the end cursor of the previous page.
+        Returns None when GitHub is unavailable and there's nothing to fall back to.
+        """
+        key = search_key(f"repo:{owner}/{repo} {search_query}", after)
+        if (cached := (await self.cache.get_many([key])).get(key)) is not None:
+            return SearchData(**cached)
+        try:
+            search_data = await self.http.search_issues(owner, repo, search_query, after=after)
+        except Unavailable as e:
+            log.warning("GitHub is unavailable, falling back to stale search results: %s", e)
+            stale = (await self.cache.get_many([key], stale=True)).get(key)
+            return SearchData(**stale) if stale is not None else None
+        await self.cache.set_many({key: dataclasses.asdict(search_data)}, SEARCH_TTL)
+        return search_data
 
     # Command groups
     @commands.guild_only()
@@ -130,6 +284,9 @@ class GitHubCards(commands.Cog):
 
         try:
             await self.http.validate_repo(owner, repo)
+        except Unavailable:
+            await ctx.send("GitHub is unavailable right now, please try again later.")
+            return
         except ApiError:
             await ctx.send('The provided GitHub repository doesn\'t exist, or is unable to be accessed due to permissions.')
             return
@@ -167,6 +324,115 @@ class GitHubCards(commands.Cog):
         )
         await ctx.send(f"List of configured prefixes on **{ctx.guild.name}** server:\n{msg}")
 
+    @ghc_group.command(name="dedupe", usage="<seconds> [link|silent]")
+    async def dedupe(self, ctx, seconds: int, mode: str = "link"):
+        """Suppress repeated cards for the same issue in a channel.
+
+        When an issue that already got a card in the channel within the last `seconds`
+        is referenced again, either a link to the earlier card is posted (`link`) or nothing at all (`silent`).
+        Use 0 seconds to turn this off.
+        """
+        mode = mode.lower()
+        if mode not in ("link", "silent"):
+            await ctx.send("The mode has to be either ``link`` or ``silent``.")
+            return
+        if not 0 <= seconds <= MAX_WINDOW:
+            await ctx.send(f"The window has to be between 0 and {MAX_WINDOW} seconds.")
+            return
+        guild_config = self.config.guild(ctx.guild)
+        await guild_config.dedupe_window.set(seconds)
+        await guild_config.dedupe_mode.set(mode)
+        if seconds:
+            self._dedupe_settings[ctx.guild.id] = (seconds, mode)
+            await ctx.send(
+                f"Repeated cards within {seconds} seconds will now be "
+                + ("replaced with a link to the earlier card." if mode == "link" else "skipped.")
+            )
+        else:
+            self._dedupe_settings.pop(ctx.guild.id, None)
+            await ctx.send("Repeated cards will no longer be suppressed.")
+
+    @checks.is_owner()
+    @ghc_group.command(name="mirror")
+    async def mirror(self, ctx, prefix: str, true_or_false: bool = None):
+        """Toggle keeping a local mirror of the repository's issues and pull requests.
+
+        Lookups for mirrored repositories are served locally,
+        the mirror is kept up to date by periodically fetching only recently updated items.
+        This is meant for big, frequently referenced repositories.
+        """
+        prefix = prefix.lower()
+        repo_config = self.config.custom("REPO", ctx.guild.id, prefix)
+        repo = await repo_config.all()
+        if repo["owner"] is None:
+            await ctx.send(f"There's no repo with prefix ``{prefix}`` configured on this server.")
+            return
+        if true_or_false is None:
+            true_or_false = not repo["mirror"]
+        await repo_config.mirror.set(true_or_false)
+        await self.rebuild_cache_for_guild(ctx.guild.id)
+
+        slug = f"{repo['owner']}/{repo['repo']}"
+        if not true_or_false:
+            await ctx.send(f"Mirroring of ``{slug}`` has been disabled.")
+            return
+        mirror = self.mirrors[(repo["owner"], repo["repo"])]
+        if not mirror.backfilled:
+            async with ctx.typing():
+                try:
+                    await mirror.sync(self.http)
+                except (ApiError, aiohttp.ClientError) as e:
+                    log.warning("Failed to backfill the mirror of %s: %s", slug, e)
+                    await ctx.send(
+                        f"Mirroring of ``{slug}`` has been enabled,"
+                        " but the initial sync failed. It will be retried in the background."
+                    )
+                    return
+        await ctx.send(f"Mirroring of ``{slug}`` has been enabled.")
+
+    @checks.is_owner()
+    @ghc_group.command(name="cache", usage="<memory|shared> [socket_path]")
+    async def cache_backend(self, ctx, backend: str, socket_path: str = None):
+        """Set where the fetched issue and pull request data is cached.
+
+        `memory` (the default) keeps the cache private to this bot process.
+        `shared` shares it between all bot processes on this host through a Unix socket,
+        every process has to be set up with the same `socket_path`.
+        """
+        backend = backend.lower()
+        if backend not in ("memory", "shared"):
+            await ctx.send("The cache backend has to be either ``memory`` or ``shared``.")
+            return
+        if backend == "shared":
+            if socket_path is None:
+                await ctx.send("The shared cache requires a socket path.")
+                return
+            await self.config.cache_socket.set(socket_path)
+        await self.config.cache_backend.set(backend)
+        await self._create_cache()
+        if backend == "shared" and not self.cache.shared:
+            await ctx.send("The shared cache isn't supported on this system, using the in-process cache.")
+            return
+        await ctx.send(f"GitHubCards will now use the ``{backend}`` cache.")
+
+    @checks.is_owner()
+    @ghc_group.command(name="load")
+    async def load(self, ctx):
+        """Show how GitHubCards is coping with the current load."""
+        controller = self.load_controller
+        ratelimit = self.http.ratelimit
+        latency = f"{self.http.latency:.2f}s" if self.http.latency is not None else "not measured"
+        budget = (
+            f"{ratelimit.remaining}/{ratelimit.limit}" if ratelimit is not None else "unknown"
+        )
+        await ctx.send(
+            f"Card mode: ``{controller.update(self.http).name}``\n"
+            f"Cards in progress: {controller.queue_depth}\n"
+            f"GitHub latency: {latency}\n"
+            f"Rate limit budget: {budget}\n"
+            f"Circuit breaker: {self.http.breaker.state}"
+        )
+
     @ghc_group.command(name="instructions")
     async def instructions(self, ctx):
         """Learn on how to setup GHC
@@ -188,20 +454,36 @@ Finally reload the cog with ``[p]reload githubcards`` and you're set to add in n
 
     async def is_eligible_as_command(self, message: discord.Message) -> bool:
         """Check if message is eligible in command-like context."""
-        return (
-            self.http._token
-            and not message.author.bot
-            and message.guild is not None
-            and await self.bot.message_eligible_as_command(message)
-            and not await self.bot.cog_disabled_in_guild(self, message.guild)
-        )
+        if not self.http._token or message.author.bot or message.guild is None:
+            return False
+        disabled, checked_at = self._disabled_in_guild.get(message.guild.id, (None, 0.0))
+        if disabled is None or time.monotonic() - checked_at > DISABLED_CACHE_TTL:
+            disabled = await self.bot.cog_disabled_in_guild(self, message.guild)
+            self._disabled_in_guild[message.guild.id] = (disabled, time.monotonic())
+        return not disabled and await self.bot.message_eligible_as_command(message)
 
     def get_matcher_by_message(self, message: discord.Message) -> Optional[Dict[str, Any]]:
         """Get matcher from message object.
 
-        This also checks if the message is eligible as command and returns None otherwise.
+        This is a synchronous prefilter, it returns None for messages
+        that can't possibly reference an issue without awaiting anything.
         """
-        return self.active_prefix_matchers.get(message.guild.id)
+        if message.guild is None or message.author.bot or "#" not in message.content:
+            return None
+        matcher = self.active_prefix_matchers.get(message.guild.id)
+        if matcher is None or len(message.content) < matcher["min_length"]:
+            return None
+        return matcher
+
+    @commands.Cog.listener()
+    async def on_command_completion(self, ctx: commands.Context):
+        """Forget the cached cog state when the cog gets enabled or disabled in guilds."""
+        if ctx.command.qualified_name in COG_TOGGLE_COMMANDS:
+            self._disabled_in_guild.clear()
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        self._disabled_in_guild.pop(guild.id, None)
 
     @commands.Cog.listener()
     async def on_red_api_tokens_update(
@@ -214,29 +496,38 @@ Finally reload the cog with ``[p]reload githubcards`` and you're set to add in n
 
     @commands.Cog.listener()
     async def on_message_without_command(self, message):
-        await self._ready.wait()
+        # Nearly every message is dropped here, before anything gets awaited.
+        if (matcher := self.get_matcher_by_message(message)) is None:
+            return
+
+        if not self._ready.is_set():
+            await self._ready.wait()
+            # the matchers might have been rebuilt in the meantime
+            if (matcher := self.get_matcher_by_message(message)) is None:
+                return
 
         if not await self.is_eligible_as_command(message):
             return
 
         # --- MODULE FOR SEARCHING! ---
-        # JSON is cached right... so this should be fine...
         # If I really want to *enjoy* this... probs rework this into a pseudo command module
-        guild_data = await self.config.custom("REPO", message.guild.id).all()
-        for prefix, data in guild_data.items():
+        for prefix, data in matcher["data"].items():
             if message.content.startswith(f"{prefix}#s "):
                 async with message.channel.typing():
                     search_query = message.content.replace(f"{prefix}#s ", "")
-                    search_data = await self.http.search_issues(
-                        data["owner"], data["repo"], search_query
+                    search_data = await self._search(data["owner"], data["repo"], search_query)
+                    if search_data is None:
+                        return
+                    await self._send_search_menu(
+                        message.channel,
+                        message.author,
+                        data["owner"],
+                        data["repo"],
+                        search_query,
+                        search_data,
                     )
-                    embed = Formatters.format_search(search_data)
-                    await message.channel.send(embed=embed)
                     return
 
-        if (matcher := self.get_matcher_by_message(message)) is None:
-            return
-
         # --- MODULE FOR GETTING EXISTING PREFIXES ---
         fetchable_repos: Dict[str, FetchableReposDict] = {}
         for item in self.splitter.split(message.content):
@@ -266,44 +557,257 @@ Finally reload the cog with ``[p]reload githubcards`` and you're set to add in n
         if len(fetchable_repos) == 0:
             return  # End if no repos are found to query over.
 
-        async with message.channel.typing():
-            await self._query_and_post(message, fetchable_repos)
+        # Shed load under pressure, see pressure.py for the modes.
+        mode = self.load_controller.update(self.http)
+        if mode is CardMode.EXPLICIT_ONLY:
+            return
+        self.load_controller.queue_depth += 1
+        try:
+            window, dedupe_mode = self._dedupe_settings.get(message.guild.id, (0, "link"))
+            if window:
+                recent = self._pop_recent_cards(message, fetchable_repos, window)
+                if recent and dedupe_mode == "link":
+                    await self._post_recent_links(message, recent)
+                if not fetchable_repos:
+                    return
+            if mode is CardMode.LINKS_ONLY:
+                await self._post_links(message, fetchable_repos)
+                return
+            async with message.channel.typing():
+                await self._query_and_post(
+                    message, fetchable_repos, cache_only=mode is CardMode.CACHE_ONLY
+                )
+        finally:
+            self.load_controller.queue_depth -= 1
+
+    async def _fetch_issues(
+        self, fetchable_repos: Dict[Tuple[str, str], FetchableReposDict], *, cache_only: bool = False
+    ) -> Dict[Tuple[str, str, int], IssueData]:
+        """Look up the requested issues in the mirrors, the cache and finally on GitHub.
+
+        GitHub isn't queried when ``cache_only`` is set.
+
+        The returned dict is keyed by ``(owner, repo, number)``,
+        issues that couldn't be found are left out.
+        """
+        found: Dict[Tuple[str, str, int], IssueData] = {}
+
+        # --- MIRROR LOOKUPS ---
+        remaining: Dict[Tuple[str, str], FetchableReposDict] = {}
+        for name_with_owner, repo_data in fetchable_repos.items():
+            mirror = self.mirrors.get(name_with_owner)
+            missing = {}
+            for number in repo_data["fetchable_issues"]:
+                issue = mirror.get(number) if mirror is not None and mirror.is_fresh() else None
+                if issue is None:
+                    missing[number] = None
+                else:
+                    found[(*name_with_owner, number)] = issue
+            if missing:
+                remaining[name_with_owner] = {**repo_data, "fetchable_issues": missing}
+
+        # --- CACHE LOOKUPS ---
+        keys = {
+            issue_key(*name_with_owner, number): (*name_with_owner, number)
+            for name_with_owner, repo_data in remaining.items()
+            for number in repo_data["fetchable_issues"]
+        }
+        if keys:
+            for key, issue_data in (await self.cache.get_many(keys)).items():
+                if key not in keys:
+                    continue
+                owner, repo, number = keys[key]
+                if issue_data is not None:  # None marks issues known not to be fetchable
+                    found[(owner, repo, number)] = Formatters.format_issue_class(issue_data)
+                del remaining[(owner, repo)]["fetchable_issues"][number]
+                if not remaining[(owner, repo)]["fetchable_issues"]:
+                    del remaining[(owner, repo)]
 
-    async def _query_and_post(self, message, fetchable_repos):
         # --- FETCHING ---
-        query = Query.build_query(fetchable_repos)
-        try:
-            query_data = await self.http.send_query(query.query_string)
-        except Unauthorized as e:
-            log.error(e)
+        if not remaining or cache_only:
+            return found
+        to_cache = {}
+        not_fetchable = {}
+        for attempt in range(QUERY_ATTEMPTS):
+            if attempt:
+                # don't pile onto GitHub while it's struggling
+                await asyncio.sleep(backoff_delay(attempt - 1))
+            query = Query.build_query(remaining)
+            try:
+                query_data = await self.http.send_query(query.query_string)
+            except Unauthorized as e:
+                log.error(e)
+                return found
+                # Lmao what's error handling
+            except Unavailable as e:
+                log.warning("GitHub is unavailable, falling back to stale data: %s", e)
+                break
+            except ApiError as e:
+                log.error("GitHub rejected the issue query, falling back to stale data: %s", e)
+                break
+
+            result = query.parse_response(query_data)
+            for key, issue_data in result.found.items():
+                to_cache[issue_key(*key)] = issue_data
+                found[key] = Formatters.format_issue_class(issue_data)
+            for key in result.permanent:
+                not_fetchable[issue_key(*key)] = None
+            if not result.transient:
+                remaining = {}
+                break
+            # only the aliases that failed transiently get queried again
+            log.debug("%s issues failed transiently: %s", len(result.transient), query_data.get("errors"))
+            remaining = {
+                name_with_owner: {
+                    **repo_data,
+                    "fetchable_issues": {
+                        number: None
+                        for number in repo_data["fetchable_issues"]
+                        if (*name_with_owner, number) in result.transient
+                    },
+                }
+                for name_with_owner, repo_data in remaining.items()
+            }
+            remaining = {k: v for k, v in remaining.items() if v["fetchable_issues"]}
+
+        if remaining:
+            await self._fill_stale(remaining, found)
+        if to_cache:
+            await self.cache.set_many(to_cache, ISSUE_TTL)
+        if not_fetchable:
+            await self.cache.set_many(not_fetchable, NEGATIVE_TTL)
+        return found
+
+    @staticmethod
+    def _requested_issues(fetchable_repos) -> List[Tuple[str, str, int]]:
+        return [
+            (*name_with_owner, number)
+            for name_with_owner, repo_data in fetchable_repos.items()
+            for number in repo_data["fetchable_issues"]
+        ]
+
+    @staticmethod
+    def _format_link(owner: str, repo: str, number: int) -> str:
+        # GitHub redirects /issues/ to /pull/ for pull requests.
+        return f"[{owner}/{repo}#{number}](https://github.com/{owner}/{repo}/issues/{number})"
+
+    def _pop_recent_cards(
+        self, message, fetchable_repos, window: float
+    ) -> List[Tuple[Tuple[str, str, int], str]]:
+        """Remove the issues that got a card in the channel within the window.
+
+        Returns the removed issues with the jump urls of their earlier cards.
+        """
+        recent = []
+        for name_with_owner, repo_data in list(fetchable_repos.items()):
+            for number in list(repo_data["fetchable_issues"]):
+                key = (*name_with_owner, number)
+                jump_url = self.recent_cards.get(message.channel.id, key, window)
+                if jump_url is not None:
+                    recent.append((key, jump_url))
+                    del repo_data["fetchable_issues"][number]
+            if not repo_data["fetchable_issues"]:
+                del fetchable_repos[name_with_owner]
+        return recent
+
+    def _remember_cards(self, message, keys, sent_message: discord.Message) -> None:
+        window, _ = self._dedupe_settings.get(message.guild.id, (0, "link"))
+        if not window:
             return
-            # Lmao what's error handling
+        for key in keys:
+            self.recent_cards.add(message.channel.id, key, sent_message.jump_url, window)
+
+    async def _post_recent_links(self, message, recent) -> None:
+        """Point to the cards that were already posted in the channel."""
+        embed = discord.Embed()
+        embed.description = "Posted recently: " + " • ".join(
+            f"[{owner}/{repo}#{number}]({jump_url})" for (owner, repo, number), jump_url in recent
+        )
+        await message.channel.send(embed=embed)
+
+    async def _post_links(self, message, fetchable_repos):
+        """Post plain links to the referenced issues without looking anything up."""
+        requested = self._requested_issues(fetchable_repos)
+        embed = discord.Embed()
+        embed.description = " • ".join(self._format_link(*key) for key in requested)
+        sent_message = await message.channel.send(embed=embed)
+        self._remember_cards(message, requested, sent_message)
+
+    async def _fill_stale(
+        self,
+        remaining: Dict[Tuple[str, str], FetchableReposDict],
+        found: Dict[Tuple[str, str, int], IssueData],
+    ) -> None:
+        """Fill ``found`` with whatever outdated data the mirrors and the cache still have."""
+        keys = {}
+        for name_with_owner, repo_data in remaining.items():
+            mirror = self.mirrors.get(name_with_owner)
+            for number in repo_data["fetchable_issues"]:
+                if mirror is not None and (issue := mirror.get(number)) is not None:
+                    found[(*name_with_owner, number)] = issue
+                else:
+                    keys[issue_key(*name_with_owner, number)] = (*name_with_owner, number)
+        if keys:
+            for key, issue_data in (await self.cache.get_many(keys, stale=True)).items():
+                if issue_data is not None and key in keys:
+                    found[keys[key]] = Formatters.format_issue_class(issue_data)
+
+    async def _fill_mergeable(
+        self, found: Dict[Tuple[str, str, int], IssueData], keys: List[Tuple[str, str, int]]
+    ) -> None:
+        """Fetch the merge state of open pull requests that came from a mirror without one."""
+        keys = [
+            key
+            for key in keys
+            if found[key].issue_type == "PullRequest"
+            and found[key].state == "OPEN"
+            and found[key].mergeable_state is None
+        ]
+        results = await asyncio.gather(
+            *(self.http.fetch_mergeable(*key) for key in keys), return_exceptions=True
+        )
+        for key, mergeable_state in zip(keys, results):
+            if isinstance(mergeable_state, Exception):
+                log.debug("Failed to fetch the merge state of %s/%s#%s: %s", *key, mergeable_state)
+                continue
+            found[key] = dataclasses.replace(found[key], mergeable_state=mergeable_state)
 
-        issue_data_list = []
-        for repo_data in query_data["data"].values():
-            for issue_data in repo_data.values():
-                if issue_data is not None:
-                    issue_data_list.append(Formatters.format_issue_class(issue_data))
+    async def _query_and_post(self, message, fetchable_repos, *, cache_only: bool = False):
+        found = await self._fetch_issues(fetchable_repos, cache_only=cache_only)
+        requested = self._requested_issues(fetchable_repos)
+        found_keys = [key for key in requested if key in found]
 
-        if not issue_data_list:
+        if not found_keys and not cache_only:
             # Fetching of all issues has failed somehow. So end it here.
             return
 
         # --- SENDING ---
         issue_embeds = []
         overflow = []
+        overflow_keys = []
 
-        for index, issue in enumerate(issue_data_list):
+        if not cache_only:
+            await self._fill_mergeable(found, found_keys[:2])
+        for index, key in enumerate(found_keys):
+            issue = found[key]
             if index < 2:
                 e = Formatters.format_issue(issue)
-                issue_embeds.append(e)
+                issue_embeds.append((key, e))
                 continue
             else:
                 overflow.append(f"[{issue.name_with_owner}#{issue.number}]({issue.url})")
-
-        for embed in issue_embeds:
-            await message.channel.send(embed=embed)
+                overflow_keys.append(key)
+        if cache_only:
+            # Whatever wasn't cached still gets a link, that's better than silently dropping it.
+            missing = [key for key in requested if key not in found]
+            overflow.extend(self._format_link(*key) for key in missing)
+            overflow_keys.extend(missing)
+
+        for key, embed in issue_embeds:
+            sent_message = await message.channel.send(embed=embed)
+            self._remember_cards(message, (key,), sent_message)
         if len(overflow) != 0:
             embed = discord.Embed()
             embed.description = " • ".join(overflow)
-            await message.channel.send(embed=embed)
+            sent_message = await message.channel.send(embed=embed)
+            self._remember_cards(message, overflow_keys, sent_message)
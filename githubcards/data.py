@@ -10,11 +10,17 @@ from typing import Optional, Tuple
 from urllib.parse import quote_plus
 
 
+# Amount of search results shown, and fetched, per page.
+SEARCH_PAGE_SIZE = 10
+
+
 @dataclass(init=True)
 class SearchData(object):
     total: int  # data/search/issueCount
     results: list  # data/search/nodes
     query: str
+    end_cursor: Optional[str] = None  # data/search/pageInfo
+    has_next_page: bool = False
 
     @property
     def escaped_query(self):
@@ -15,3 +15,13 @@ class ApiError(Exception):
 
 class Unauthorized(ApiError):
     pass
+
+
+class Unavailable(ApiError):
+    """GitHub couldn't be reached in time or kept failing."""
+    pass
+
+
+class CircuitOpen(Unavailable):
+    """Requests aren't being sent to GitHub at all after repeated failures."""
+    pass
@@ -7,10 +7,11 @@
 import discord
 from redbot.core.utils.chat_formatting import pagify
 
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Dict, List, TypedDict
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Set, Tuple, TypedDict
 
-from .data import IssueData, SearchData, IssueStateColour
+from .data import SEARCH_PAGE_SIZE, IssueData, SearchData, IssueStateColour
 from .calls import Queries
 
 
@@ -90,14 +91,14 @@ class Formatters:
         return embed
 
     @staticmethod
-    def format_search(search_data: SearchData) -> discord.Embed:
-        """Format the search results into an embed"""
+    def format_search(search_data: SearchData, page: int = 0) -> discord.Embed:
+        """Format a page of the search results into an embed"""
         embed = discord.Embed()
         embed_body = ""
         if not search_data.results:
             embed.description = "Nothing found."
             return embed
-        for entry in search_data.results[:10]:
+        for entry in search_data.results[:SEARCH_PAGE_SIZE]:
             if entry["state"] == "OPEN":
                 state = "\N{LARGE GREEN CIRCLE}"
             elif entry["state"] == "CLOSED":
@@ -123,8 +124,12 @@ class Formatters:
                 f"\n{state} - **{issue_type}** - **[#{entry['number']}]({entry['url']})**\n"
                 f"{entry['title']}"
             )
-        if search_data.total > 10:
-            embed.set_footer(text=f"Showing the first 10 results, {search_data.total} results in total.")
+        if search_data.total > SEARCH_PAGE_SIZE:
+            first = page * SEARCH_PAGE_SIZE + 1
+            last = first + len(search_data.results[:SEARCH_PAGE_SIZE]) - 1
+            embed.set_footer(
+                text=f"Showing results {first}-{last}, {search_data.total} results in total."
+            )
             embed_body += (
                 "\n\n[Click here for all the results]"
                 f"(https://github.com/search?type=Issues&q={search_data.escaped_query})"
@@ -140,6 +145,19 @@ class FetchableReposDict(TypedDict):
     fetchable_issues: Dict[int, None]
 
 
+# GraphQL error types which won't go away by retrying.
+PERMANENT_ERROR_TYPES = frozenset(("NOT_FOUND", "FORBIDDEN"))
+
+
+@dataclass
+class QueryResult:
+    """Outcome of a batched issue query, keyed by ``(owner, repo, number)``."""
+
+    found: Dict[Tuple[str, str, int], Dict[str, Any]] = field(default_factory=dict)
+    transient: Set[Tuple[str, str, int]] = field(default_factory=set)
+    permanent: Set[Tuple[str, str, int]] = field(default_factory=set)
+
+
 class Query:
     def __init__(self, query_string: str, repos: List[FetchableReposDict]):
         self.query_string = query_string
@@ -166,3 +184,52 @@ class Query:
         query_string = Queries.findIssueQuery % {"repositories": "\n".join(repo_queries)}
 
         return cls(query_string, repos)
+
+    def _keys_for_path(self, path: Optional[Sequence[Any]]) -> Set[Tuple[str, str, int]]:
+        """Map the path of a GraphQL error back to the issues it affects."""
+        try:
+            repo_data = self.repos[int(path[0][len("repo"):])]
+        except (TypeError, IndexError, ValueError):
+            # not attributable to a single alias, so it affects all of them
+            return {
+                (repo_data["owner"], repo_data["repo"], number)
+                for repo_data in self.repos
+                for number in repo_data["fetchable_issues"]
+            }
+        numbers = repo_data["fetchable_issues"]
+        if len(path) > 1 and str(path[1]).startswith("issue"):
+            try:
+                numbers = [int(path[1][len("issue"):])]
+            except ValueError:
+                pass
+        return {(repo_data["owner"], repo_data["repo"], number) for number in numbers}
+
+    def parse_response(self, json: Mapping[str, Any]) -> QueryResult:
+        """Split the response into found issues and transient or permanent failures."""
+        result = QueryResult()
+        data = json.get("data")
+        for idx, repo_data in enumerate(self.repos):
+            repo_result = (data or {}).get(f"repo{idx}") or {}
+            for number in repo_data["fetchable_issues"]:
+                issue_data = repo_result.get(f"issue{number}")
+                if issue_data is not None:
+                    result.found[(repo_data["owner"], repo_data["repo"], number)] = issue_data
+
+        for error in json.get("errors") or ():
+            keys = self._keys_for_path(error.get("path")) - result.found.keys()
+            if error.get("type") in PERMANENT_ERROR_TYPES:
+                result.permanent |= keys
+            else:
+                result.transient |= keys
+        result.permanent -= result.transient
+
+        missing = (
+            self._keys_for_path(None) - result.found.keys() - result.transient - result.permanent
+        )
+        if data is None:
+            # nothing came back and GitHub didn't say why
+            result.transient |= missing
+        else:
+            # null without an error, the issue doesn't exist
+            result.permanent |= missing
+        return result
@@ -6,19 +6,41 @@
 
 from __future__ import annotations
 
+import asyncio
 import datetime
 import logging
-from typing import Any, Callable, Dict, Mapping, Optional
+import random
+import time
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
 
 import aiohttp
 
 from .calls import Queries
-from .data import SearchData
-from .exceptions import ApiError, Unauthorized
+from .data import SEARCH_PAGE_SIZE, SearchData
+from .exceptions import ApiError, CircuitOpen, Unauthorized, Unavailable
 
 baseUrl = "https://api.github.com/graphql"
 log = logging.getLogger("red.githubcards.http")
 
+# Weight of the newest sample in the moving average of request latency.
+LATENCY_SMOOTHING = 0.2
+
+# Timeout of a single request and the deadline of a call including its retries, in seconds.
+REQUEST_TIMEOUT = 10.0
+CALL_DEADLINE = 20.0
+MAX_ATTEMPTS = 3
+# Retries wait a random time up to BACKOFF_BASE * 2 ** attempt, capped at BACKOFF_CAP.
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+# The circuit opens after this many failures in a row and stays open for the cooldown.
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30.0
+
+
+def backoff_delay(attempt: int) -> float:
+    """Get a random delay before retrying after the given, zero based, attempt."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
 
 class RateLimit:
     """
@@ -47,18 +69,82 @@ class RateLimit:
             try:
                 limit = ratelimit_data["limit"]
                 remaining = ratelimit_data["remaining"]
-                reset = datetime.strptime(ratelimit_data["resetAt"], '%Y-%m-%dT%H:%M:%SZ')
+                reset = datetime.datetime.strptime(
+                    ratelimit_data["resetAt"], '%Y-%m-%dT%H:%M:%SZ'
+                ).replace(tzinfo=datetime.timezone.utc)
             except KeyError:
                 return None
-        else:
-            cost = ratelimit_data.get("cost")
-            return cls(limit=limit, remaining=remaining, reset=reset, cost=cost)
+        cost = ratelimit_data.get("cost")
+        return cls(limit=limit, remaining=remaining, reset=reset, cost=cost)
+
+    @property
+    def remaining_ratio(self) -> float:
+        """Share of the budget that's left, a full budget once the reset time has passed."""
+        if self.limit <= 0 or datetime.datetime.now(datetime.timezone.utc) >= self.reset:
+            return 1.0
+        return self.remaining / self.limit
+
+
+class CircuitBreaker:
+    """Fails fast after repeated failures.
+
+    Once the cooldown is over, a single trial request is let through,
+    its result decides whether the circuit closes again.
+    """
+
+    def __init__(self, *, threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN) -> None:
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        # the trial counts as lost if it hasn't finished within the cooldown, e.g. when cancelled
+        self._trial_started_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "open"
+        return "half-open"
+
+    @property
+    def _trial_in_progress(self) -> bool:
+        return (
+            self._trial_started_at is not None
+            and time.monotonic() - self._trial_started_at < self.cooldown
+        )
+
+    def before_request(self) -> None:
+        state = self.state
+        if state == "open" or (state == "half-open" and self._trial_in_progress):
+            raise CircuitOpen("GitHub requests are paused after repeated failures.")
+        if state == "half-open":
+            self._trial_started_at = time.monotonic()
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_started_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.threshold:
+            if self.opened_at is None:
+                log.warning("Opening the circuit after %s failed GitHub requests.", self.failures)
+            self.opened_at = time.monotonic()
+            self._trial_started_at = None
 
 
 class GitHubAPI:
     def __init__(self, token: str) -> None:
         self.session: aiohttp.ClientSession
         self._token: str
+        # moving average of request latency in seconds and when it was last updated
+        self.latency: Optional[float] = None
+        self.latency_updated_at = 0.0
+        self.ratelimit: Optional[RateLimit] = None
+        self.breaker = CircuitBreaker()
         self._create_session(token)
 
     async def recreate_session(self, token: str) -> None:
@@ -73,76 +159,191 @@ class GitHubAPI:
             "User-Agent": "Py aiohttp - GitHubCards (github.com/Kowlin/sentinel)"
         }
         self._token = token
-        self.session = aiohttp.ClientSession(headers=headers)
+        self.session = aiohttp.ClientSession(
+            headers=headers, timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+        )
+
+    @staticmethod
+    def _retry_after(status: int, headers: Mapping[str, Any], json: Any) -> Optional[float]:
+        """Get the time to wait before retrying, None if the response shouldn't be retried."""
+        if status >= 500:
+            return 0.0
+        if status in (403, 429):
+            # Secondary rate limits, see
+            # https://docs.github.com/en/rest/using-the-rest-api/rate-limits-for-the-rest-api
+            if "retry-after" in headers:
+                return float(headers["retry-after"])
+            if isinstance(json, dict) and "secondary rate limit" in str(json.get("message", "")):
+                return 60.0
+        return None
+
+    async def _post(self, payload: Dict[str, Any]) -> Tuple[int, Mapping[str, Any], Any]:
+        """Send a GraphQL request, retrying server errors and secondary rate limits.
+
+        Raises `Unavailable` when GitHub couldn't be reached before the deadline
+        and `CircuitOpen` while the circuit breaker is open.
+        """
+        deadline = time.monotonic() + CALL_DEADLINE
+        for attempt in range(MAX_ATTEMPTS):
+            self.breaker.before_request()
+            started = time.monotonic()
+            timeout = aiohttp.ClientTimeout(total=min(REQUEST_TIMEOUT, deadline - started))
+            try:
+                async with self.session.post(baseUrl, json=payload, timeout=timeout) as call:
+                    status, headers = call.status, call.headers
+                    json = await call.json(content_type=None) if status < 500 else None
+            except (asyncio.TimeoutError, aiohttp.ClientError, ValueError) as e:
+                # failed requests count as well, timeouts are the slowest requests of all
+                self._record_latency(started)
+                error = Unavailable(f"Request to GitHub failed: {e!r}")
+                retry_after = 0.0
+            else:
+                self._record_latency(started)
+                retry_after = self._retry_after(status, headers, json)
+                if retry_after is None:
+                    self.breaker.record_success()
+                    return status, headers, json
+                error = Unavailable(f"GitHub responded with status {status}.")
+
+            self.breaker.record_failure()
+            delay = max(retry_after, backoff_delay(attempt))
+            if (
+                attempt + 1 == MAX_ATTEMPTS
+                or self.breaker.state != "closed"
+                or time.monotonic() + delay >= deadline
+            ):
+                raise error
+            log.debug("Retrying GitHub request in %.2fs: %s", delay, error)
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    @staticmethod
+    def _check_response(status: int, json: Any, *, require_data: bool = True) -> Dict[str, Any]:
+        """Raise the matching `ApiError` for responses that don't carry the queried data.
+
+        Exhausted rate limits raise `Unavailable`, like the failures `_post` gave up retrying.
+        """
+        if not isinstance(json, dict):
+            raise Unavailable(f"GitHub responded with status {status} and no JSON object.")
+        message = json.get("message", "")
+        if status == 401:
+            raise Unauthorized(message or "Bad credentials")
+        if status in (403, 429) and "rate limit" in str(message).lower():
+            raise Unavailable(f"GitHub rate limit exceeded: {message}")
+        if status >= 400:
+            raise ApiError(f"GitHub responded with status {status}: {message}")
+        if require_data:
+            if "errors" in json:
+                raise ApiError(json["errors"])
+            if not isinstance(json.get("data"), dict):
+                raise ApiError("GitHub responded without any data.")
+        return json
 
     async def validate_user(self):
-        async with self.session.post(baseUrl, json={"query": Queries.validateUser}) as call:
-            json = await call.json()
-            if call.status == 401:
-                raise Unauthorized(json["message"])
-            if "errors" in json.keys():
-                raise ApiError(json['errors'])
-            self._log_ratelimit(
-                self.validate_user, call.headers, ratelimit_data=json['data']['rateLimit']
-            )
-            return json
+        status, headers, json = await self._post({"query": Queries.validateUser})
+        json = self._check_response(status, json)
+        self._log_ratelimit(
+            self.validate_user, headers, ratelimit_data=json['data']['rateLimit']
+        )
+        return json
 
     async def validate_repo(self, repoOwner: str, repoName: str):
-        async with self.session.post(
-            baseUrl,
-            json={
+        status, headers, json = await self._post(
+            {
                 "query": Queries.validateRepo,
                 "variables": {"repoOwner": repoOwner, "repoName": repoName},
-            },
-        ) as call:
-            json = await call.json()
-            if call.status == 401:
-                raise Unauthorized(json["message"])
-            if "errors" in json.keys():
-                raise ApiError(json['errors'])
-            self._log_ratelimit(
-                self.validate_repo, call.headers, ratelimit_data=json['data']['rateLimit']
-            )
-            return json
+            }
+        )
+        json = self._check_response(status, json)
+        self._log_ratelimit(
+            self.validate_repo, headers, ratelimit_data=json['data']['rateLimit']
+        )
+        return json
 
-    async def search_issues(self, repoOwner: str, repoName: str, searchParam: str):
+    async def search_issues(
+        self,
+        repoOwner: str,
+        repoName: str,
+        searchParam: str,
+        *,
+        after: Optional[str] = None,
+        first: int = SEARCH_PAGE_SIZE,
+    ):
         query = f"repo:{repoOwner}/{repoName} {searchParam}"
-        async with self.session.post(
-            baseUrl,
-            json={
+        status, headers, json = await self._post(
+            {
                 "query": Queries.searchIssues,
-                "variables": {"query": query}
+                "variables": {"query": query, "first": first, "after": after}
             }
-        ) as call:
-            json = await call.json()
-            if "errors" in json.keys():
-                raise ApiError(json['errors'])
-            self._log_ratelimit(
-                self.search_issues, call.headers, ratelimit_data=json['data']['rateLimit']
-            )
-            search_results = json['data']['search']
+        )
+        json = self._check_response(status, json)
+        self._log_ratelimit(
+            self.search_issues, headers, ratelimit_data=json['data']['rateLimit']
+        )
+        search_results = json['data']['search']
 
-            data = SearchData(
-                total=search_results['issueCount'],
-                results=search_results['nodes'],
-                query=query
-            )
-            return data
+        data = SearchData(
+            total=search_results['issueCount'],
+            results=search_results['nodes'],
+            query=query,
+            end_cursor=search_results['pageInfo']['endCursor'],
+            has_next_page=search_results['pageInfo']['hasNextPage'],
+        )
+        return data
 
-    async def send_query(self, query: str):
-        async with self.session.post(
-            baseUrl,
-            json={
-                "query": query
+    async def fetch_mirror_page(
+        self,
+        kind: str,
+        repoOwner: str,
+        repoName: str,
+        *,
+        after: Optional[str] = None,
+        since: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Fetch a single page of the ``issues`` or ``pullRequests`` connection."""
+        if kind == "issues":
+            query = Queries.mirrorIssues
+            variables = {"repoOwner": repoOwner, "repoName": repoName, "after": after, "since": since}
+        else:
+            query = Queries.mirrorPullRequests
+            variables = {"repoOwner": repoOwner, "repoName": repoName, "after": after}
+        status, headers, json = await self._post({"query": query, "variables": variables})
+        json = self._check_response(status, json)
+        self._log_ratelimit(
+            self.fetch_mirror_page, headers, ratelimit_data=json['data']['rateLimit']
+        )
+        return json['data']['repository'][kind]
+
+    async def fetch_mergeable(self, repoOwner: str, repoName: str, number: int) -> Optional[str]:
+        """Fetch the current mergeable state of a pull request."""
+        status, headers, json = await self._post(
+            {
+                "query": Queries.findMergeable,
+                "variables": {"repoOwner": repoOwner, "repoName": repoName, "number": number},
             }
-        ) as call:
-            json = await call.json()
-            if call.status == 401:
-                raise Unauthorized(json["message"])
-            self._log_ratelimit(self.send_query, call.headers)
-            if call.status == 401:
-                raise Unauthorized(json["message"])
-            return json
+        )
+        json = self._check_response(status, json)
+        self._log_ratelimit(
+            self.fetch_mergeable, headers, ratelimit_data=json['data']['rateLimit']
+        )
+        pull_request = json['data']['repository']['pullRequest']
+        return pull_request['mergeable'] if pull_request is not None else None
+
+    async def send_query(self, query: str):
+        status, headers, json = await self._post({"query": query})
+        # errors of single aliases are sorted out by the caller
+        json = self._check_response(status, json, require_data=False)
+        self._log_ratelimit(self.send_query, headers)
+        return json
+
+    def _record_latency(self, started: float) -> None:
+        now = time.monotonic()
+        elapsed = now - started
+        if self.latency is None:
+            self.latency = elapsed
+        else:
+            self.latency = LATENCY_SMOOTHING * elapsed + (1 - LATENCY_SMOOTHING) * self.latency
+        self.latency_updated_at = now
 
     def _log_ratelimit(
         self,
@@ -153,6 +354,7 @@ class GitHubAPI:
     ) -> None:
         ratelimit = RateLimit.from_http(headers, ratelimit_data)
         if ratelimit is not None:
+            self.ratelimit = ratelimit
             log.debug(
                 "%s; cost %s, remaining: %s/%s",
                 func.__name__,
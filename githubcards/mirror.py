@@ -0,0 +1,114 @@
+"""
+  This Source Code Form is subject to the terms of the Mozilla Public
+  License, v. 2.0. If a copy of the MPL was not distributed with this
+  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from .data import IssueData
+from .formatters import Formatters
+
+log = logging.getLogger("red.githubcards.mirror")
+
+# How often the mirrors are delta synced, in seconds.
+SYNC_INTERVAL = 600
+# Mirrors that haven't synced successfully within this window aren't used for lookups.
+MAX_STALENESS = 1800
+
+# Connections which are mirrored; issues and pull requests share the same number space.
+MIRRORED_KINDS = ("issues", "pullRequests")
+# Characters of the body kept per mirrored item, cards only show the first 300.
+BODY_LIMIT = 400
+
+
+class RepositoryMirror:
+    """Local copy of the issue and pull request metadata of a single repository.
+
+    The first sync pages through the whole repository (the backfill),
+    every sync after that only asks for items updated after the last watermark.
+    Pull requests are mirrored without their mergeable state, it changes without
+    bumping ``updatedAt``, so it's fetched when a card gets rendered instead.
+    Only the start of each body is kept, that's all a card shows.
+    """
+
+    def __init__(self, owner: str, repo: str) -> None:
+        self.owner = owner
+        self.repo = repo
+        self.items: Dict[int, IssueData] = {}
+        # Highest ``updatedAt`` value seen per connection, ISO 8601 strings compare fine.
+        self.watermarks: Dict[str, Optional[str]] = {kind: None for kind in MIRRORED_KINDS}
+        self.last_synced: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return (self.owner, self.repo)
+
+    @property
+    def backfilled(self) -> bool:
+        return self.last_synced is not None
+
+    def is_fresh(self, max_staleness: float = MAX_STALENESS) -> bool:
+        return self.backfilled and time.monotonic() - self.last_synced <= max_staleness
+
+    def get(self, number: int) -> Optional[IssueData]:
+        return self.items.get(number)
+
+    def apply_page(
+        self, kind: str, connection: Mapping[str, Any], pending: Dict[str, Optional[str]]
+    ) -> bool:
+        """Merge a page of the given connection into the mirror.
+
+        The nodes are ordered by ``updatedAt`` descending, so paging stops as soon as
+        a node which is not newer than the current watermark is seen.
+        ``pending`` collects the new watermarks, which are only committed
+        once the whole sync succeeded.
+
+        Returns whether the next page should be fetched.
+        """
+        watermark = self.watermarks[kind]
+        for node in connection["nodes"]:
+            if node is None:
+                continue
+            updated_at = node["updatedAt"]
+            if watermark is not None and updated_at <= watermark:
+                return False
+            if pending.get(kind) is None or updated_at > pending[kind]:
+                pending[kind] = updated_at
+            if node["body"] and len(node["body"]) > BODY_LIMIT:
+                node = {**node, "body": node["body"][:BODY_LIMIT]}
+            self.items[node["number"]] = Formatters.format_issue_class(node)
+        return connection["pageInfo"]["hasNextPage"]
+
+    async def sync(self, http) -> int:
+        """Run a backfill or a delta sync, returns the amount of queries made."""
+        async with self._lock:
+            pending: Dict[str, Optional[str]] = {}
+            queries = 0
+            for kind in MIRRORED_KINDS:
+                after = None
+                while True:
+                    connection = await http.fetch_mirror_page(
+                        kind, self.owner, self.repo, after=after, since=self.watermarks[kind]
+                    )
+                    queries += 1
+                    if not self.apply_page(kind, connection, pending):
+                        break
+                    after = connection["pageInfo"]["endCursor"]
+
+            for kind, watermark in pending.items():
+                if watermark is not None:
+                    self.watermarks[kind] = watermark
+            self.last_synced = time.monotonic()
+            log.debug(
+                "Synced mirror of %s/%s with %s queries, %s items mirrored.",
+                self.owner,
+                self.repo,
+                queries,
+                len(self.items),
+            )
+            return queries
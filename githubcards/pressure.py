@@ -0,0 +1,90 @@
+"""
+  This Source Code Form is subject to the terms of the Mozilla Public
+  License, v. 2.0. If a copy of the MPL was not distributed with this
+  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import enum
+import logging
+import time
+from typing import Optional, Sequence
+
+log = logging.getLogger("red.githubcards.pressure")
+
+# Thresholds at which each signal asks for CACHE_ONLY, LINKS_ONLY and EXPLICIT_ONLY respectively.
+QUEUE_DEPTH_THRESHOLDS = (10, 25, 50)  # card jobs in progress
+LATENCY_THRESHOLDS = (2.0, 5.0, 10.0)  # seconds, moving average of GitHub request latency
+BUDGET_THRESHOLDS = (0.2, 0.1, 0.05)  # share of the rate limit budget that's left
+
+# To step back down, the signals have to get this much below the thresholds...
+EXIT_RATIO = 0.5
+# ...and stay there for this many seconds.
+COOLDOWN = 60.0
+# Latency samples older than this are ignored, nothing gets measured while we avoid GitHub.
+LATENCY_MAX_AGE = 120.0
+
+
+class CardMode(enum.IntEnum):
+    """How much work is done for passive ``prefix#N`` cards, cheapest last."""
+
+    FULL = 0  # fetch whatever is needed and post full cards
+    CACHE_ONLY = 1  # don't query GitHub, post cards for cached issues and links for the rest
+    LINKS_ONLY = 2  # don't look anything up, post a single embed with links
+    EXPLICIT_ONLY = 3  # skip passive cards entirely, explicit searches still work
+
+
+def _level(value: float, thresholds: Sequence[float], *, descending: bool = False) -> int:
+    if descending:
+        return sum(value <= threshold for threshold in thresholds)
+    return sum(value >= threshold for threshold in thresholds)
+
+
+class LoadController:
+    """Picks the card mode from queue depth, GitHub latency and the remaining budget.
+
+    Escalation happens immediately, relaxing happens one mode at a time,
+    once the signals have been comfortably below the thresholds for ``COOLDOWN`` seconds.
+    """
+
+    def __init__(self) -> None:
+        self.mode = CardMode.FULL
+        self.queue_depth = 0
+        self._calm_since: Optional[float] = None
+
+    def _target(self, latency: float, budget: float, *, ratio: float = 1.0) -> CardMode:
+        level = max(
+            _level(self.queue_depth, [t * ratio for t in QUEUE_DEPTH_THRESHOLDS]),
+            _level(latency, [t * ratio for t in LATENCY_THRESHOLDS]),
+            _level(budget, [min(t / ratio, 1.0) for t in BUDGET_THRESHOLDS], descending=True),
+        )
+        return CardMode(level)
+
+    def update(self, http) -> CardMode:
+        """Re-evaluate the mode using the state of the given `GitHubAPI`."""
+        now = time.monotonic()
+        latency = 0.0
+        if http.latency is not None and now - http.latency_updated_at <= LATENCY_MAX_AGE:
+            latency = http.latency
+        budget = http.ratelimit.remaining_ratio if http.ratelimit is not None else 1.0
+
+        target = self._target(latency, budget)
+        if target > self.mode:
+            log.warning(
+                "Switching to %s mode (queue depth: %s, latency: %.2fs, budget left: %.0f%%)",
+                target.name,
+                self.queue_depth,
+                latency,
+                budget * 100,
+            )
+            self.mode = target
+            self._calm_since = None
+        elif self.mode > CardMode.FULL and self._target(latency, budget, ratio=EXIT_RATIO) < self.mode:
+            if self._calm_since is None:
+                self._calm_since = now
+            elif now - self._calm_since >= COOLDOWN:
+                self.mode = CardMode(self.mode - 1)
+                self._calm_since = now if self.mode > CardMode.FULL else None
+                log.info("Load dropped, switching back to %s mode", self.mode.name)
+        else:
+            self._calm_since = None
+        return self.mode
@@ -0,0 +1,61 @@
+"""
+  This Source Code Form is subject to the terms of the Mozilla Public
+  License, v. 2.0. If a copy of the MPL was not distributed with this
+  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+# Longest duplicate suppression window that can be set, in seconds.
+MAX_WINDOW = 3600
+
+
+class RecentCards:
+    """Index of the cards recently posted in each channel.
+
+    Memory is bounded both per channel and in the amount of channels tracked,
+    the least recently active channels are forgotten first.
+    Entries within a channel are kept in posting order, so expired ones are pruned from the front.
+    """
+
+    def __init__(self, *, max_channels: int = 4096, max_per_channel: int = 50) -> None:
+        self.max_channels = max_channels
+        self.max_per_channel = max_per_channel
+        # channel_id -> card key -> (posted at, jump url)
+        self._channels: OrderedDict[int, OrderedDict[Hashable, Tuple[float, str]]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._channels)
+
+    def _prune(self, channel_id: int, window: float) -> Optional[OrderedDict]:
+        cards = self._channels.get(channel_id)
+        if cards is None:
+            return None
+        threshold = time.monotonic() - window
+        while cards and next(iter(cards.values()))[0] < threshold:
+            cards.popitem(last=False)
+        if not cards:
+            del self._channels[channel_id]
+            return None
+        return cards
+
+    def get(self, channel_id: int, key: Hashable, window: float) -> Optional[str]:
+        """Get the jump url of the card if it was posted in the channel within the window."""
+        cards = self._prune(channel_id, window)
+        if cards is None or key not in cards:
+            return None
+        return cards[key][1]
+
+    def add(self, channel_id: int, key: Hashable, jump_url: str, window: float) -> None:
+        cards = self._prune(channel_id, window)
+        if cards is None:
+            cards = self._channels[channel_id] = OrderedDict()
+        self._channels.move_to_end(channel_id)
+        cards.pop(key, None)
+        cards[key] = (time.monotonic(), jump_url)
+        if len(cards) > self.max_per_channel:
+            cards.popitem(last=False)
+        while len(self._channels) > self.max_channels:
+            self._channels.popitem(last=False)
@@ -0,0 +1,121 @@
+"""
+  This Source Code Form is subject to the terms of the Mozilla Public
+  License, v. 2.0. If a copy of the MPL was not distributed with this
+  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, List, Optional
+
+import discord
+
+from .data import SearchData
+from .exceptions import ApiError, Unavailable
+from .formatters import Formatters
+
+
+class SearchMenu(discord.ui.View):
+    """Menu over the search results, fetching further pages only once they're navigated to.
+
+    Pages that were already fetched are kept for the lifetime of the menu.
+    """
+
+    def __init__(
+        self,
+        first_page: SearchData,
+        fetch_page: Callable[[str], Awaitable[Optional[SearchData]]],
+        *,
+        author: discord.abc.User,
+        timeout: float = 90,
+    ) -> None:
+        super().__init__(timeout=timeout)
+        self.pages: List[SearchData] = [first_page]
+        self.current_page = 0
+        self.author = author
+        self.message: Optional[discord.Message] = None
+        self._fetch_page = fetch_page
+        self._fetch_lock = asyncio.Lock()
+        self._update_buttons()
+
+    @property
+    def is_paginating(self) -> bool:
+        return len(self.pages) > 1 or self.pages[0].has_next_page
+
+    def current_embed(self) -> discord.Embed:
+        return Formatters.format_search(self.pages[self.current_page], self.current_page)
+
+    def _update_buttons(self) -> None:
+        self.previous_page.disabled = self.current_page == 0
+        self.next_page.disabled = (
+            self.current_page + 1 == len(self.pages) and not self.pages[-1].has_next_page
+        )
+
+    async def _show(self, interaction: discord.Interaction) -> None:
+        self._update_buttons()
+        if interaction.response.is_done():
+            await interaction.edit_original_response(embed=self.current_embed(), view=self)
+        else:
+            await interaction.response.edit_message(embed=self.current_embed(), view=self)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.author.id:
+            await interaction.response.send_message(
+                "You're not the author of this search.", ephemeral=True
+            )
+            return False
+        return True
+
+    async def on_timeout(self) -> None:
+        if self.message is None:
+            return
+        try:
+            await self.message.edit(view=None)
+        except discord.HTTPException:
+            pass
+
+    @discord.ui.button(
+        emoji="\N{BLACK LEFT-POINTING TRIANGLE}\N{VARIATION SELECTOR-16}",
+        style=discord.ButtonStyle.grey,
+    )
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.current_page -= 1
+        await self._show(interaction)
+
+    @discord.ui.button(
+        emoji="\N{BLACK RIGHT-POINTING TRIANGLE}\N{VARIATION SELECTOR-16}",
+        style=discord.ButtonStyle.grey,
+    )
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if self._fetch_lock.locked():
+            # the next page is still being fetched for a previous click
+            await interaction.response.defer()
+            return
+        if self.current_page + 1 == len(self.pages):
+            # fetching can take a moment, acknowledge the interaction first
+            await interaction.response.defer()
+            async with self._fetch_lock:
+                try:
+                    page = await self._fetch_page(self.pages[-1].end_cursor)
+                except Unavailable:
+                    page = None
+                except ApiError:
+                    await interaction.followup.send(
+                        "GitHub couldn't fetch the next page of results.", ephemeral=True
+                    )
+                    return
+            if page is None:
+                await interaction.followup.send(
+                    "GitHub is unavailable right now, please try again later.", ephemeral=True
+                )
+                return
+            self.pages.append(page)
+        self.current_page += 1
+        await self._show(interaction)
+
+    @discord.ui.button(
+        emoji="\N{HEAVY MULTIPLICATION X}\N{VARIATION SELECTOR-16}",
+        style=discord.ButtonStyle.red,
+    )
+    async def close(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.stop()
+        await interaction.response.edit_message(view=None)
@@ -0,0 +1,160 @@
+"""
+  This Source Code Form is subject to the terms of the Mozilla Public
+  License, v. 2.0. If a copy of the MPL was not distributed with this
+  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+# Benchmark of ``Massmove.move_all_members`` against a simulated voice gateway.
+#
+# Members are stand-ins whose ``move_to`` takes a random latency, fails at a configurable rate
+# and shares a rate limit bucket with the other moves, either raising 429s
+# or waiting out the bucket the way discord.py does.
+#
+#     python -m massmove.benchmark --members 10 100 1000 --latency 0.15 --failure-rate 0.01
+
+import argparse
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+from typing import List
+
+import discord
+
+from .massmove import Massmove
+
+
+class FakeResponse:
+    def __init__(self, status: int, reason: str, retry_after: float = 0.0) -> None:
+        self.status = status
+        self.reason = reason
+        self.headers = {"Retry-After": str(retry_after)} if retry_after else {}
+
+
+class FakeGateway:
+    """The shared state of the simulated API: latency, failures and a rate limit bucket."""
+
+    def __init__(self, args: argparse.Namespace, rng: random.Random) -> None:
+        self.latency = args.latency
+        self.failure_rate = args.failure_rate
+        self.bucket_size = args.bucket_size
+        self.bucket_window = args.bucket_window
+        self.raise_429 = args.ratelimit == "raise"
+        self.rng = rng
+        self.calls = 0
+        self.rate_limited = 0
+        self._bucket_reset = 0.0
+        self._bucket_remaining = self.bucket_size
+
+    async def _take_token(self) -> None:
+        while True:
+            now = time.monotonic()
+            if now >= self._bucket_reset:
+                self._bucket_reset = now + self.bucket_window
+                self._bucket_remaining = self.bucket_size
+            if self._bucket_remaining > 0:
+                self._bucket_remaining -= 1
+                return
+            self.rate_limited += 1
+            retry_after = self._bucket_reset - now
+            if self.raise_429:
+                raise discord.HTTPException(
+                    FakeResponse(429, "Too Many Requests", retry_after), "You are being rate limited."
+                )
+            await asyncio.sleep(retry_after)
+
+    async def move(self, member: "FakeMember", channel: "FakeChannel") -> None:
+        self.calls += 1
+        await self._take_token()
+        await asyncio.sleep(self.rng.lognormvariate(0, 0.5) * self.latency)
+        if self.rng.random() < self.failure_rate:
+            raise discord.HTTPException(FakeResponse(500, "Internal Server Error"), "Server error")
+        member.voice.channel.members.remove(member)
+        channel.members.append(member)
+        member.voice.channel = channel
+
+
+class FakeChannel:
+    def __init__(self, channel_id: int) -> None:
+        self.id = channel_id
+        self.mention = f"<#{channel_id}>"
+        self.members: List["FakeMember"] = []
+        self.user_limit = 0
+        self._permissions = SimpleNamespace(move_members=True)
+
+    def permissions_for(self, member) -> SimpleNamespace:
+        return self._permissions
+
+
+class FakeMember:
+    def __init__(self, member_id: int, channel: FakeChannel, gateway: FakeGateway) -> None:
+        self.id = member_id
+        self.voice = SimpleNamespace(channel=channel)
+        self._gateway = gateway
+        channel.members.append(self)
+
+    async def move_to(self, channel: FakeChannel) -> None:
+        await self._gateway.move(self, channel)
+
+
+class FakeMessage:
+    async def edit(self, **kwargs) -> None:
+        pass
+
+
+class FakeContext:
+    def __init__(self) -> None:
+        self.guild = SimpleNamespace(me=object())
+        self.messages = 0
+
+    async def send(self, *args, **kwargs) -> FakeMessage:
+        self.messages += 1
+        return FakeMessage()
+
+
+async def run_once(cog: Massmove, members: int, args: argparse.Namespace, rng: random.Random) -> None:
+    gateway = FakeGateway(args, rng)
+    source, destination = FakeChannel(1), FakeChannel(2)
+    for member_id in range(members):
+        FakeMember(member_id, source, gateway)
+    ctx = FakeContext()
+
+    started = time.perf_counter()
+    await cog.move_all_members(ctx, source, destination)
+    elapsed = time.perf_counter() - started
+
+    moved = len(destination.members)
+    print(
+        f"{members:>6} members: {elapsed:8.3f}s, {moved / elapsed:8.1f} moves/s,"
+        f" moved {moved}, left behind {len(source.members)},"
+        f" {gateway.calls / max(moved, 1):.3f} API calls per moved member,"
+        f" rate limited {gateway.rate_limited} times, {ctx.messages} messages sent"
+    )
+
+
+async def run(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    cog = Massmove(SimpleNamespace())
+    for members in args.members:
+        await run_once(cog, members, args, rng)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark Massmove.move_all_members")
+    parser.add_argument("--members", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--latency", type=float, default=0.15, help="median seconds per move")
+    parser.add_argument("--failure-rate", type=float, default=0.01)
+    parser.add_argument("--bucket-size", type=int, default=10, help="moves per rate limit window")
+    parser.add_argument("--bucket-window", type=float, default=1.0, help="seconds")
+    parser.add_argument(
+        "--ratelimit",
+        choices=("raise", "wait"),
+        default="wait",
+        help="raise 429s or wait out the bucket like discord.py",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,10 @@ import discord
 
 from redbot.core import commands, checks
 
-from typing import Union
+from typing import List, Union
+
+from .mover import Move, MoveJob
+from .plan import MovePlan, plan_gather, plan_split
 
 
 class Massmove(commands.Cog):
@@ -75,25 +78,135 @@ class Massmove(commands.Cog):
             return await ctx.send("You have to be in an voice channel to use this command.")
         await self.move_all_members(ctx, voice.channel, channel_to)
 
+    @checks.mod_or_permissions(move_members=True)
+    @massmove.command(
+        usage="<from channel> <to channels...>"
+    )
+    async def split(
+        self,
+        ctx,
+        channel_from: Union[discord.VoiceChannel, discord.StageChannel],
+        *channels_to: Union[discord.VoiceChannel, discord.StageChannel]
+    ):
+        """Split the members of a channel evenly over other channels.
+
+        Channels that reach their user limit are skipped.
+
+        Arguments:
+            - `from channel`: The channel members will get moved from
+            - `to channels`: The channels members will get moved to
+        """
+        if not channels_to:
+            return await ctx.send_help()
+        await self.run_plan(ctx, [channel_from], channels_to, plan_split(channel_from, channels_to))
+
+    @checks.mod_or_permissions(move_members=True)
+    @massmove.command(
+        usage="<role> <from channel> <to channels...>"
+    )
+    async def splitrole(
+        self,
+        ctx,
+        role: discord.Role,
+        channel_from: Union[discord.VoiceChannel, discord.StageChannel],
+        *channels_to: Union[discord.VoiceChannel, discord.StageChannel]
+    ):
+        """Split the members of a channel evenly, spreading the members of a role evenly as well.
+
+        Useful to give every team its share of captains or veterans.
+        Channels that reach their user limit are skipped.
+
+        Arguments:
+            - `role`: The role to spread evenly
+            - `from channel`: The channel members will get moved from
+            - `to channels`: The channels members will get moved to
+        """
+        if not channels_to:
+            return await ctx.send_help()
+        await self.run_plan(
+            ctx, [channel_from], channels_to, plan_split(channel_from, channels_to, role=role)
+        )
+
+    @checks.mod_or_permissions(move_members=True)
+    @massmove.command(
+        usage="<to channel> <from channels or categories...>"
+    )
+    async def gather(
+        self,
+        ctx,
+        channel_to: Union[discord.VoiceChannel, discord.StageChannel],
+        *channels_from: Union[discord.VoiceChannel, discord.StageChannel, discord.CategoryChannel]
+    ):
+        """Gather the members of several channels into one.
+
+        Categories stand for all the voice and stage channels in them.
+        Members who don't fit within the user limit are left where they are.
+
+        Arguments:
+            - `to channel`: The channel members will get moved to
+            - `from channels or categories`: The channels members will get moved from
+        """
+        if not channels_from:
+            return await ctx.send_help()
+        sources = []
+        for channel in channels_from:
+            if isinstance(channel, discord.CategoryChannel):
+                sources.extend(channel.voice_channels + channel.stage_channels)
+            else:
+                sources.append(channel)
+        await self.run_plan(ctx, sources, [channel_to], plan_gather(sources, channel_to))
+
+    async def run_plan(
+        self,
+        ctx,
+        sources: List[discord.abc.GuildChannel],
+        destinations: List[discord.abc.GuildChannel],
+        plan: MovePlan
+    ):
+        """Internal function for running a move plan across several channels"""
+        for channel in (*sources, *destinations):
+            if channel.permissions_for(ctx.guild.me).move_members is False:
+                return await ctx.send(f"I don't have permissions to move members in {channel.mention}.")
+        if not plan.moves:
+            if plan.unplaced:
+                return await ctx.send("There's no room left in the target channels.")
+            return await ctx.send("There are no members to move.")
+        await self.run_job(ctx, MoveJob(plan.moves), unplaced=len(plan.unplaced))
+
     async def move_all_members(self, ctx, channel_from: discord.VoiceChannel, channel_to: discord.VoiceChannel):
         """Internal function for massmoving, massmoves all members to the target channel"""
-        plural = True
-        member_amount = len(channel_from.members)
-        if member_amount == 0:
+        if not channel_from.members:
             return await ctx.send(f"{channel_from.mention} doesn't have any members in it.")
-        elif member_amount == 1:
-            plural = False
         # Check permissions to ensure a smooth transisition
         if channel_from.permissions_for(ctx.guild.me).move_members is False:
             return await ctx.send(f"I don't have permissions to move members in {channel_from.mention}.")
         if channel_to.permissions_for(ctx.guild.me).move_members is False:
             return await ctx.send(f"I don't have permissions to move members in {channel_to.mention}.")
         # Move the members
-        for member in channel_from.members:
+        job = MoveJob([Move(member, channel_from, channel_to) for member in channel_from.members])
+        await self.run_job(ctx, job)
+
+    async def run_job(self, ctx, job: MoveJob, *, unplaced: int = 0):
+        """Run the move job, keeping a progress message up to date"""
+        progress_message = await ctx.send(f"Massmoving {len(job.moves)} member{'s' if len(job.moves) != 1 else ''}...")
+
+        async def progress(job: MoveJob):
             try:
-                await member.move_to(channel_to)
-            except:
+                await progress_message.edit(
+                    content=f"Massmoving... ``{job.done}``/``{len(job.moves)}`` done."
+                )
+            except discord.HTTPException:
                 pass
-        await ctx.send(
-            f"Done, massmoved {member_amount} member{'s' if plural else ''} from **{channel_from.mention}** to **{channel_to.mention}**."
-        )
+
+        await job.run(progress)
+        summary = f"Done, moved ``{job.moved}`` member{'s' if job.moved != 1 else ''}."
+        if job.failed:
+            summary += f" ``{job.failed}`` failed."
+        if job.skipped:
+            summary += f" ``{job.skipped}`` skipped since they left or were moved already."
+        if unplaced:
+            summary += f" ``{unplaced}`` didn't fit within the user limits."
+        try:
+            await progress_message.edit(content=summary)
+        except discord.HTTPException:
+            await ctx.send(summary)
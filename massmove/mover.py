@@ -0,0 +1,135 @@
+"""
+  This Source Code Form is subject to the terms of the Mozilla Public
+  License, v. 2.0. If a copy of the MPL was not distributed with this
+  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List, NamedTuple, Optional, Set
+
+import discord
+
+log = logging.getLogger("red.massmove.mover")
+
+# Concurrency starts here and adapts between the bounds.
+INITIAL_CONCURRENCY = 4
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 16
+# A move this many times slower than the average means discord.py waited out a rate limit.
+SLOW_FACTOR = 4.0
+LATENCY_SMOOTHING = 0.2
+# Moves that keep getting rate limited are given up after this many attempts.
+MAX_ATTEMPTS = 3
+# Progress is reported at most this often, in seconds.
+PROGRESS_INTERVAL = 2.0
+
+
+class Move(NamedTuple):
+    member: discord.Member
+    source: discord.abc.GuildChannel
+    destination: discord.abc.GuildChannel
+
+
+class MoveJob:
+    """Moves members with bounded concurrency that adapts to rate limits.
+
+    The limit grows by one after each round of successful moves and halves
+    whenever a move gets rate limited, either by a 429 or by a move that took far
+    longer than usual because discord.py was waiting for the bucket to reset.
+    """
+
+    def __init__(self, moves: List[Move]) -> None:
+        self.moves = moves
+        self.moved = 0
+        self.failed = 0
+        self.skipped = 0
+        self.api_calls = 0
+        self.concurrency = INITIAL_CONCURRENCY
+        self.latency: Optional[float] = None
+        self._successes = 0
+        self._paused_until = 0.0
+
+    @property
+    def done(self) -> int:
+        return self.moved + self.failed + self.skipped
+
+    def _throttle(self, retry_after: float = 0.0) -> None:
+        self.concurrency = max(MIN_CONCURRENCY, self.concurrency // 2)
+        self._successes = 0
+        self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+    def _record_success(self, elapsed: float) -> None:
+        if self.latency is not None and elapsed > SLOW_FACTOR * self.latency:
+            log.debug("Move took %.2fs, backing off from %s concurrent moves", elapsed, self.concurrency)
+            self._throttle()
+            return
+        if self.latency is None:
+            self.latency = elapsed
+        else:
+            self.latency = LATENCY_SMOOTHING * elapsed + (1 - LATENCY_SMOOTHING) * self.latency
+        self._successes += 1
+        if self._successes >= self.concurrency:
+            self._successes = 0
+            self.concurrency = min(MAX_CONCURRENCY, self.concurrency + 1)
+
+    async def _move(self, move: Move) -> None:
+        voice = move.member.voice
+        if voice is None or voice.channel is None or voice.channel.id != move.source.id:
+            self.skipped += 1  # left or got moved by someone else in the meantime
+            return
+        for _ in range(MAX_ATTEMPTS):
+            delay = self._paused_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            started = time.monotonic()
+            self.api_calls += 1
+            try:
+                await move.member.move_to(move.destination)
+            except discord.RateLimited as e:
+                retry_after = e.retry_after
+                error = e
+            except discord.HTTPException as e:
+                if e.status != 429:
+                    log.debug("Failed to move %s to %s: %s", move.member, move.destination, e)
+                    self.failed += 1
+                    return
+                retry_after = float(e.response.headers.get("Retry-After", 1))
+                error = e
+            else:
+                self._record_success(time.monotonic() - started)
+                self.moved += 1
+                return
+            self._throttle(retry_after)
+        log.debug("Gave up moving %s after being rate limited: %s", move.member, error)
+        self.failed += 1
+
+    async def run(self, progress: Optional[Callable[["MoveJob"], Awaitable[None]]] = None) -> None:
+        pending = iter(self.moves)
+        in_flight: Set[asyncio.Task] = set()
+        last_progress = time.monotonic()
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(in_flight) < self.concurrency:
+                    move = next(pending, None)
+                    if move is None:
+                        exhausted = True
+                        break
+                    in_flight.add(asyncio.create_task(self._move(move)))
+                if not in_flight:
+                    break
+                finished, in_flight = await asyncio.wait(
+                    in_flight, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in finished:
+                    if task.exception() is not None:
+                        log.error("Unexpected error while moving a member", exc_info=task.exception())
+                        self.failed += 1
+                if progress is not None and time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+                    last_progress = time.monotonic()
+                    await progress(self)
+        finally:
+            for task in in_flight:
+                task.cancel()
@@ -0,0 +1,89 @@
+"""
+  This Source Code Form is subject to the terms of the Mozilla Public
+  License, v. 2.0. If a copy of the MPL was not distributed with this
+  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+from typing import Iterable, List, NamedTuple, Optional, Sequence
+
+import discord
+
+from .mover import Move
+
+
+class MovePlan(NamedTuple):
+    moves: List[Move]
+    # members that didn't fit into any of the destinations
+    unplaced: List[discord.Member]
+
+
+def free_slots(channel: discord.abc.GuildChannel) -> Optional[int]:
+    """Get how many more members fit in the channel, None if it has no user limit."""
+    user_limit = getattr(channel, "user_limit", 0)
+    if not user_limit:
+        return None
+    return max(0, user_limit - len(channel.members))
+
+
+def plan_split(
+    source: discord.abc.GuildChannel,
+    destinations: Sequence[discord.abc.GuildChannel],
+    *,
+    role: Optional[discord.Role] = None,
+) -> MovePlan:
+    """Spread the members of the source over the destinations.
+
+    Each member goes to the destination with the fewest members so far,
+    skipping destinations at their user limit.
+    With a role, its members are placed first and spread evenly on their own,
+    so every destination gets its share of them.
+    """
+    # a channel given twice would have its free slots counted twice
+    unique = {channel.id: channel for channel in destinations if channel.id != source.id}
+    destinations = list(unique.values())
+    occupancy = [len(channel.members) for channel in destinations]
+    slots = [free_slots(channel) for channel in destinations]
+    with_role = [0] * len(destinations)
+
+    members = list(source.members)
+    if role is not None:
+        members.sort(key=lambda member: role not in member.roles)
+
+    moves = []
+    unplaced = []
+    for member in members:
+        has_role = role is not None and role in member.roles
+        candidates = [idx for idx, free in enumerate(slots) if free is None or free > 0]
+        if not candidates:
+            unplaced.append(member)
+            continue
+        if has_role:
+            idx = min(candidates, key=lambda idx: (with_role[idx], occupancy[idx], idx))
+            with_role[idx] += 1
+        else:
+            idx = min(candidates, key=lambda idx: (occupancy[idx], idx))
+        occupancy[idx] += 1
+        if slots[idx] is not None:
+            slots[idx] -= 1
+        moves.append(Move(member, source, destinations[idx]))
+    return MovePlan(moves, unplaced)
+
+
+def plan_gather(
+    sources: Iterable[discord.abc.GuildChannel], destination: discord.abc.GuildChannel
+) -> MovePlan:
+    """Move the members of all sources into the destination, up to its user limit."""
+    slots = free_slots(destination)
+    moves = []
+    unplaced = []
+    # a channel given twice would have its members planned twice
+    unique = {source.id: source for source in sources if source.id != destination.id}
+    for source in unique.values():
+        for member in source.members:
+            if slots is not None:
+                if slots == 0:
+                    unplaced.append(member)
+                    continue
+                slots -= 1
+            moves.append(Move(member, source, destination))
+    return MovePlan(moves, unplaced)
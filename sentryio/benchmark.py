@@ -0,0 +1,173 @@
+# Exercise of ``SpoolingTransport`` against a local stand-in for Sentry's ingestion endpoint.
+#
+# Events are sent while the endpoint is up, during an outage and after it comes back,
+# with the client replaced mid-outage like a cog reload does. Checks that every event
+# arrives exactly once and reports the cost of capturing an event and the transport's counters.
+#
+#     python -m sentryio.benchmark --events 100
+
+import argparse
+import gzip
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List
+
+import sentry_sdk
+from sentry_sdk.envelope import Envelope
+
+from .transport import BATCH_SIZE, SpoolingTransport
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Accepts envelopes like Sentry does, answering 503 while it's down."""
+
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.up = True
+        self.received: Counter[str] = Counter()
+        self.refused = 0
+        self.lock = threading.Lock()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    server: StandInServer
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if not self.server.up:
+            with self.server.lock:
+                self.server.refused += 1
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        event_id = Envelope.deserialize(body).headers.get("event_id")
+        with self.server.lock:
+            self.server.received[event_id] += 1
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def init(dsn: str, spool_dir: Path) -> SpoolingTransport:
+    sentry_sdk.init(
+        dsn,
+        transport=SpoolingTransport.with_spool(spool_dir),
+        default_integrations=False,
+        # the stand-in is local, don't send to it through a proxy from the environment
+        http_proxy="",
+        shutdown_timeout=0,
+    )
+    transport = sentry_sdk.get_client().transport
+    assert isinstance(transport, SpoolingTransport)
+    return transport
+
+
+def capture(count: int, label: str, samples: List[int]) -> List[str]:
+    event_ids = []
+    clock = time.perf_counter_ns
+    for idx in range(count):
+        if idx and not idx % BATCH_SIZE:
+            # a burst larger than the queue drops events, which isn't what's checked here
+            sentry_sdk.flush()
+        before = clock()
+        event_ids.append(sentry_sdk.capture_message(f"{label} {idx}"))
+        samples.append(clock() - before)
+    return event_ids
+
+
+def wait_for(condition, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def report_transport(label: str, transport: SpoolingTransport) -> None:
+    files, size = transport.spool_size
+    print(
+        f"{label}: sent {transport.sent}, replayed {transport.replayed}, spooled {transport.spooled},"
+        f" in the spool {files} ({size / 1024:.1f} KiB), dropped {transport.dropped},"
+        f" discarded {transport.discarded}, rejected {transport.rejected},"
+        f" rate limited {transport.rate_limited}"
+    )
+
+
+def run(args: argparse.Namespace) -> bool:
+    server = StandInServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    dsn = f"http://public@127.0.0.1:{server.server_address[1]}/1"
+    samples: List[int] = []
+    expected: List[str] = []
+
+    with tempfile.TemporaryDirectory() as data_path:
+        spool_dir = Path(data_path) / "spool"
+        first = init(dsn, spool_dir)
+        expected += capture(args.events, "up", samples)
+        first.flush(args.timeout)
+
+        server.up = False
+        expected += capture(args.events, "outage", samples)
+        # replace the client mid-outage, like reloading the cog does
+        before = time.perf_counter()
+        sentry_sdk.get_client().close(timeout=0)
+        closed = time.perf_counter() - before
+        second = init(dsn, spool_dir)
+        expected += capture(args.events, "new client", samples)
+        second.flush(args.timeout)
+        stopped = first.join(args.timeout)
+
+        server.up = True
+        expected += capture(args.events, "recovered", samples)
+        drained = wait_for(
+            lambda: not second.queued and second.spool_size[0] == 0 and second.reachable,
+            args.timeout,
+        )
+        sentry_sdk.get_client().close(timeout=args.timeout)
+        second.join(args.timeout)
+
+    server.shutdown()
+    samples.sort()
+    print(
+        f"capture_message: {len(samples)} events, mean {statistics.fmean(samples) / 1000:.2f}us,"
+        f" p99 {samples[int(len(samples) * 0.99)] / 1000:.2f}us, max {samples[-1] / 1000:.2f}us"
+    )
+    print(f"Closing the client took {closed * 1000:.2f}ms, first worker stopped: {stopped}")
+    report_transport("first transport", first)
+    report_transport("second transport", second)
+    missing = [event_id for event_id in expected if event_id not in server.received]
+    duplicated = [event_id for event_id, count in server.received.items() if count > 1]
+    print(
+        f"Received {sum(server.received.values())} of {len(expected)} events,"
+        f" {len(missing)} missing, {len(duplicated)} duplicated,"
+        f" {server.refused} requests refused during the outage"
+    )
+    return stopped and drained and not missing and not duplicated
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Exercise SpoolingTransport against a stand-in server")
+    parser.add_argument("--events", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    if not run(parser.parse_args()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,26 @@
 import asyncio
+import datetime
 import logging
-from typing import Mapping, Optional
+import time
+import weakref
+from typing import Dict, Mapping, Optional
 
 import discord
 import sentry_sdk
-from redbot.core import checks, commands
+from redbot.core import Config, checks, commands
 from redbot.core.bot import Red
-from redbot.core.utils.chat_formatting import inline
+from redbot.core.data_manager import cog_data_path
+from redbot.core.utils.chat_formatting import box, inline, pagify
 from redbot.core.utils.views import SetApiView
-from sentry_sdk import add_breadcrumb
 from sentry_sdk.integrations.aiohttp import AioHttpIntegration
 from sentry_sdk.integrations.logging import LoggingIntegration
 
+from .crumbs import Crumb, CrumbBuffer
+from .histogram import LatencyHistogram
+from .sampling import TraceSampler
+from .transport import SpoolingTransport
+from .watchdog import LoopWatchdog
+
 log = logging.getLogger("red.sentinel.sentryio.core")
 
 
@@ -20,11 +29,34 @@ class SentryIO(commands.Cog):
 
     def __init__(self, bot: Red):
         self.bot = bot
+        self.config = Config.get_conf(self, identifier=25360019)
+        self.config.register_global(
+            traces_default_rate=0.1,
+            traces_cog_rates={},
+            traces_command_rates={},
+            traces_max_per_second=5.0,
+            traces_slow_threshold=0.0,
+            traces_keep_errors=False,
+            watchdog_enabled=False,
+            watchdog_threshold=0.5,
+        )
+        self.sampler = TraceSampler()
+        self.crumbs = CrumbBuffer()
+        # qualified command name -> latencies of its invocations
+        self.latencies: Dict[str, LatencyHistogram] = {}
+        # context -> (when the command started, its transaction)
+        self._running: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self.watchdog: Optional[LoopWatchdog] = None
+        self.transport: Optional[SpoolingTransport] = None
 
     async def cog_load(self) -> None:
+        self.bot.add_check(self._trace_command, call_once=True)
         asyncio.create_task(self.startup())
 
     def cog_unload(self) -> None:
+        self.bot.remove_check(self._trace_command, call_once=True)
+        if self.watchdog is not None:
+            self.watchdog.stop()
         self.close_sentry()
 
     async def red_get_data_for_user(self, **kwargs):
@@ -50,22 +82,45 @@ class SentryIO(commands.Cog):
         log.info("Initializing Sentry with DSN: %s", dsn)
         sentry_sdk.init(
             dsn,
-            traces_sample_rate=1.0,
+            transport=SpoolingTransport.with_spool(cog_data_path(self) / "spool"),
+            traces_sampler=self.sampler,
+            before_send_transaction=self.sampler.before_send_transaction,
+            before_send=self.crumbs.before_send,
             shutdown_timeout=0,
             integrations=[
                 AioHttpIntegration(),
                 LoggingIntegration(level=logging.INFO, event_level=logging.ERROR),
             ],
         )
+        transport = sentry_sdk.get_client().transport
+        if isinstance(transport, SpoolingTransport):
+            self.transport = transport
 
     def close_sentry(self) -> None:
         client = sentry_sdk.Hub.current.client
         if client is not None:
             log.info("Closing Sentry client")
+            # the transport's worker spools anything it didn't send yet in the background,
+            # the next transport waits for it before sending from the spool
             client.close(timeout=0)
+        self.transport = None
 
     async def startup(self) -> None:
+        await self.update_sampler()
         self.init_sentry(await self._get_dsn())
+        await self.update_watchdog()
+
+    async def update_watchdog(self) -> None:
+        if self.watchdog is not None:
+            self.watchdog.stop()
+            self.watchdog = None
+        settings = await self.config.all()
+        if settings["watchdog_enabled"]:
+            self.watchdog = LoopWatchdog(settings["watchdog_threshold"])
+            self.watchdog.start()
+
+    async def update_sampler(self) -> None:
+        self.sampler.update(await self.config.all())
 
     @commands.group(name="sentryio")  # type: ignore
     @checks.is_owner()
@@ -83,6 +138,188 @@ class SentryIO(commands.Cog):
             f"Sentry.IO is initialized with DSN: {inline(client.options['dsn'])}"
         )
 
+    @sentry_group.command(name="transport")
+    async def transport_stats(self, ctx):
+        """Show what happened to the events sent to Sentry.IO since it was initialized."""
+        transport = self.transport
+        if transport is None:
+            return await ctx.send("Sentry.IO is not initialized.")
+        spooled_files, spooled_bytes = transport.spool_size
+        lost = ", ".join(f"{reason}: {count}" for reason, count in transport.lost.most_common())
+        await ctx.send(
+            f"Endpoint reachable: {inline(str(transport.reachable))}\n"
+            f"Queued: {inline(str(transport.queued))}\n"
+            f"Sent: {inline(str(transport.sent))}, "
+            f"replayed from the spool: {inline(str(transport.replayed))}\n"
+            f"Spooled: {inline(str(transport.spooled))}, "
+            f"still in the spool: {inline(f'{spooled_files} ({spooled_bytes / 1024:.1f} KiB)')}\n"
+            f"Dropped with a full queue: {inline(str(transport.dropped))}, "
+            f"with a full spool: {inline(str(transport.discarded))}\n"
+            f"Rate limited: {inline(str(transport.rate_limited))}, "
+            f"rejected: {inline(str(transport.rejected))}\n"
+            f"Lost before sending: {inline(lost or 'None')}"
+        )
+
+    @sentry_group.command(name="perf")
+    async def perf(self, ctx, cog_name: Optional[str] = None):
+        """Show the latency percentiles of commands since the cog was loaded.
+
+        Commands are sorted by their 95th percentile, slowest first."""
+        rows = []
+        for command_name, histogram in self.latencies.items():
+            command = self.bot.get_command(command_name)
+            command_cog = command.cog_name if command is not None else None
+            if cog_name is not None and (command_cog or "").lower() != cog_name.lower():
+                continue
+            rows.append((histogram.percentile(0.95), command_name, histogram))
+        if not rows:
+            return await ctx.send("No commands were run yet.")
+        rows.sort(key=lambda row: row[0], reverse=True)
+        name_width = max(len("Command"), *(len(command_name) for _, command_name, _ in rows))
+        lines = [
+            f"{'Command':<{name_width}} {'Calls':>7} {'Errors':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'Max':>8}"
+        ]
+        for _, command_name, histogram in rows:
+            lines.append(
+                f"{command_name:<{name_width}} {histogram.count:>7} {histogram.errors:>6}"
+                + "".join(
+                    f" {value * 1000:>6.0f}ms"
+                    for value in (
+                        histogram.percentile(0.5),
+                        histogram.percentile(0.95),
+                        histogram.percentile(0.99),
+                        histogram.max,
+                    )
+                )
+            )
+        for page in pagify("\n".join(lines), shorten_by=10):
+            await ctx.send(box(page))
+
+    @sentry_group.group(name="watchdog")
+    async def watchdog_group(self, ctx):
+        """Detect and report code that blocks the event loop."""
+
+    @watchdog_group.command(name="enable")
+    async def watchdog_enable(self, ctx, true_or_false: bool):
+        """Turn the event loop watchdog on or off."""
+        await self.config.watchdog_enabled.set(true_or_false)
+        await self.update_watchdog()
+        await ctx.tick()
+
+    @watchdog_group.command(name="threshold")
+    async def watchdog_threshold(self, ctx, seconds: float):
+        """Set for how long the event loop has to be blocked to be reported."""
+        if seconds < 0.1:
+            return await ctx.send("The threshold has to be at least 0.1 seconds.")
+        await self.config.watchdog_threshold.set(seconds)
+        await self.update_watchdog()
+        await ctx.tick()
+
+    @watchdog_group.command(name="show")
+    async def watchdog_show(self, ctx):
+        """Show the most recent times the event loop was blocked."""
+        if self.watchdog is None:
+            return await ctx.send("The watchdog is turned off.")
+        header = (
+            f"Threshold: {inline(f'{self.watchdog.threshold}s')}, "
+            f"highest lag: {inline(f'{self.watchdog.max_lag:.3f}s')}"
+        )
+        if not self.watchdog.stalls:
+            return await ctx.send(f"{header}\nThe event loop wasn't blocked yet.")
+        lines = [
+            f"{datetime.datetime.fromtimestamp(stall.started_at, datetime.timezone.utc):%H:%M:%S} UTC"
+            f" {stall.duration:.2f}s {stall.running}\n    at {stall.location}"
+            for stall in reversed(self.watchdog.stalls)
+        ]
+        await ctx.send(header)
+        for page in pagify("\n".join(lines), shorten_by=10):
+            await ctx.send(box(page))
+
+    @sentry_group.group(name="tracing")
+    async def tracing_group(self, ctx):
+        """Configure which performance transactions are sent to Sentry.IO."""
+
+    @tracing_group.command(name="show")
+    async def tracing_show(self, ctx):
+        """Show the tracing settings."""
+        settings = await self.config.all()
+        cog_rates = ", ".join(f"{name}: {rate}" for name, rate in settings["traces_cog_rates"].items())
+        command_rates = ", ".join(
+            f"{name}: {rate}" for name, rate in settings["traces_command_rates"].items()
+        )
+        slow_threshold = settings["traces_slow_threshold"]
+        await ctx.send(
+            f"Default rate: {inline(str(settings['traces_default_rate']))}\n"
+            f"Cog rates: {inline(cog_rates or 'None')}\n"
+            f"Command rates: {inline(command_rates or 'None')}\n"
+            f"Max transactions per second: {inline(str(settings['traces_max_per_second']))}\n"
+            f"Always keep transactions slower than: {inline(f'{slow_threshold}s' if slow_threshold else 'Off')}\n"
+            f"Always keep failed transactions: {inline(str(settings['traces_keep_errors']))}\n"
+            f"Dropped by the cap since load: {inline(str(self.sampler.dropped))}"
+        )
+
+    @tracing_group.command(name="rate")
+    async def tracing_rate(self, ctx, rate: float):
+        """Set the share of transactions that are sent, between 0 and 1."""
+        if not 0 <= rate <= 1:
+            return await ctx.send("The rate has to be between 0 and 1.")
+        await self.config.traces_default_rate.set(rate)
+        await self.update_sampler()
+        await ctx.tick()
+
+    @tracing_group.command(name="cog")
+    async def tracing_cog(self, ctx, cog_name: str, rate: Optional[float] = None):
+        """Set the rate for the commands of a cog, leave out the rate to use the default."""
+        if rate is not None and not 0 <= rate <= 1:
+            return await ctx.send("The rate has to be between 0 and 1.")
+        async with self.config.traces_cog_rates() as cog_rates:
+            if rate is None:
+                cog_rates.pop(cog_name, None)
+            else:
+                cog_rates[cog_name] = rate
+        await self.update_sampler()
+        await ctx.tick()
+
+    @tracing_group.command(name="command")
+    async def tracing_command(self, ctx, command_name: str, rate: Optional[float] = None):
+        """Set the rate for a command, leave out the rate to use the cog's or the default.
+
+        Use quotes for subcommands, e.g. \"sentryio status\"."""
+        if rate is not None and not 0 <= rate <= 1:
+            return await ctx.send("The rate has to be between 0 and 1.")
+        async with self.config.traces_command_rates() as command_rates:
+            if rate is None:
+                command_rates.pop(command_name, None)
+            else:
+                command_rates[command_name] = rate
+        await self.update_sampler()
+        await ctx.tick()
+
+    @tracing_group.command(name="cap")
+    async def tracing_cap(self, ctx, per_second: float):
+        """Set the maximum of transactions sent per second, 0 for no cap."""
+        if per_second < 0:
+            return await ctx.send("The cap can't be negative.")
+        await self.config.traces_max_per_second.set(per_second)
+        await self.update_sampler()
+        await ctx.tick()
+
+    @tracing_group.command(name="slow")
+    async def tracing_slow(self, ctx, seconds: float):
+        """Always send transactions that took at least this many seconds, 0 to turn off."""
+        if seconds < 0:
+            return await ctx.send("The threshold can't be negative.")
+        await self.config.traces_slow_threshold.set(seconds)
+        await self.update_sampler()
+        await ctx.tick()
+
+    @tracing_group.command(name="errors")
+    async def tracing_errors(self, ctx, true_or_false: bool):
+        """Always send transactions that failed."""
+        await self.config.traces_keep_errors.set(true_or_false)
+        await self.update_sampler()
+        await ctx.tick()
+
     @sentry_group.command(name="instructions")
     async def instructions(self, ctx):
         """
@@ -113,71 +350,97 @@ class SentryIO(commands.Cog):
             return
         self.init_sentry(await self._get_dsn(api_tokens))
 
-    def prepare_crumbs_commands(self, ctx: commands.Context) -> Mapping[str, str]:
-        crumb_data = {
-            "command_name": getattr(ctx.command, "qualified_name", "None"),
-            "cog_name": getattr(ctx.command.cog, "qualified_name", "None"),
-            "author_id": getattr(ctx.author, "id", "None"),
-            "guild_id": getattr(ctx.guild, "id", "None"),
-            "channel_id": getattr(ctx.channel, "id", "None"),
-        }
-        for comm_arg, value in ctx.kwargs.items():
-            crumb_data[f"command_arg_{comm_arg}"] = value
-        return crumb_data
-    
-    def prepare_crumbs_interactions(self, interaction: discord.Interaction) -> Mapping[str, str]:
-        crumb_data = {
-            "interaction_id": getattr(interaction, "id", "None"),
-            "channel_id": getattr(interaction.channel, "id", "None"),
-            "guild_id": getattr(interaction.guild, "id", "None"),
-            "user_id": getattr(interaction.user, "id", "None"),
-            "message_id": getattr(interaction.message, "id", "None"),
-        }
-        return crumb_data
+    def record_command_crumb(self, ctx: commands.Context, category: str, level: str) -> None:
+        self.crumbs.record(
+            Crumb(
+                time.time(),
+                category,
+                level,
+                ctx.command.qualified_name,
+                ctx.author.name,
+                ctx.author.id,
+                ctx.guild.id if ctx.guild is not None else None,
+                ctx.channel.id,
+                ctx.cog.qualified_name if ctx.cog is not None else None,
+            )
+        )
+
+    async def _trace_command(self, ctx: commands.Context) -> bool:
+        """Global check that starts the transaction of the command, it always passes."""
+        self.start_command_transaction(ctx)
+        return True
+
+    def start_command_transaction(self, ctx: commands.Context) -> None:
+        """Start the transaction of the command and make it the active span.
+
+        This has to run in the task that invokes the command, listeners and invoke hooks
+        run in tasks of their own, so it's called from a global check.
+        The active span is set on a fork of the current scope, which only the command's task
+        and the tasks it creates see, spans started by the command get attached to the transaction.
+        """
+        command_name = ctx.command.qualified_name
+        cog_name = ctx.cog.qualified_name if ctx.cog is not None else None
+        transaction = sentry_sdk.start_transaction(
+            op="command",
+            name=command_name,
+            custom_sampling_context={"command": command_name, "cog": cog_name},
+        )
+        transaction.set_tag("command", command_name)
+        transaction.set_tag("cog", cog_name)
+        scope = sentry_sdk.get_current_scope().fork()
+        scope.span = transaction
+        sentry_sdk.Scope.set_current_scope(scope)
+        self._running[ctx] = (time.perf_counter(), transaction)
+
+    def finish_command_transaction(self, ctx: commands.Context, status: str) -> None:
+        running = self._running.pop(ctx, None)
+        if running is None:
+            return
+        started, transaction = running
+        command_name = ctx.command.qualified_name
+        histogram = self.latencies.get(command_name)
+        if histogram is None:
+            histogram = self.latencies[command_name] = LatencyHistogram()
+        histogram.record(time.perf_counter() - started, error=status != "ok")
+        transaction.set_status(status)
+        transaction.finish()
 
     @commands.Cog.listener()
     async def on_command_error(self, ctx: commands.Context, error):
         if not ctx.command:
             return
-
-        crumb_data = self.prepare_crumbs_commands(ctx)
-        add_breadcrumb(
-            type="user",
-            category="on_command_error",
-            message=f'Command "{ctx.command.qualified_name}" failed for {ctx.author.name} ({ctx.author.id})',
-            level="error",
-            data=crumb_data,
-        )
+        self.record_command_crumb(ctx, "on_command_error", "error")
+        if isinstance(error, commands.CommandInvokeError):
+            status = "internal_error"
+        elif isinstance(error, commands.CheckFailure):
+            status = "permission_denied"
+        elif isinstance(error, commands.UserInputError):
+            status = "invalid_argument"
+        else:
+            status = "unknown_error"
+        self.finish_command_transaction(ctx, status)
 
     @commands.Cog.listener()
     async def on_command(self, ctx: commands.Context):
-        crumb_data = self.prepare_crumbs_commands(ctx)
-        add_breadcrumb(
-            type="user",
-            category="on_command",
-            message=f'Command "{ctx.command.qualified_name}" ran for {ctx.author.name} ({ctx.author.id})',
-            level="info",
-            data=crumb_data,
-        )
+        self.record_command_crumb(ctx, "on_command", "info")
 
     @commands.Cog.listener()
     async def on_command_completion(self, ctx: commands.Context):
-        crumb_data = self.prepare_crumbs_commands(ctx)
-        add_breadcrumb(
-            type="user",
-            category="on_command_completion",
-            message=f'Command "{ctx.command.qualified_name}" completed for {ctx.author.name} ({ctx.author.id})',
-            level="info",
-            data=crumb_data,
-        )
+        self.record_command_crumb(ctx, "on_command_completion", "info")
+        self.finish_command_transaction(ctx, "ok")
 
     @commands.Cog.listener()
     async def on_interaction(self, interaction: discord.Interaction):
-        crumb_data = self.prepare_crumbs_interactions(interaction)
-        add_breadcrumb(
-            type="user",
-            category="on_interaction",
-            message=f'Interaction "{interaction.id}" ran for {interaction.user.name} ({interaction.user.id})',
-            level="info",
-            data=crumb_data,
+        self.crumbs.record(
+            Crumb(
+                time.time(),
+                "on_interaction",
+                "info",
+                str(interaction.id),
+                interaction.user.name,
+                interaction.user.id,
+                interaction.guild_id,
+                interaction.channel_id,
+                interaction.message.id if interaction.message is not None else None,
+            )
         )
@@ -0,0 +1,77 @@
+import collections
+import datetime
+from typing import Any, Deque, Dict, Mapping, NamedTuple, Optional
+
+from .sampling import timestamp_of
+
+# Same as the SDK's default max_breadcrumbs.
+MAX_CRUMBS = 100
+
+
+class Crumb(NamedTuple):
+    timestamp: float
+    category: str
+    level: str
+    # command name or interaction ID
+    subject: str
+    user_name: str
+    user_id: Optional[int]
+    guild_id: Optional[int]
+    channel_id: Optional[int]
+    # cog name for commands, message ID for interactions
+    extra: Any
+
+
+class CrumbBuffer:
+    """Fixed-size ring buffer of compact crumbs.
+
+    Recording a crumb is a single deque append, they are only turned into
+    Sentry breadcrumbs in ``before_send``, for the rare event that actually gets sent.
+    """
+
+    def __init__(self, maxlen: int = MAX_CRUMBS) -> None:
+        self.crumbs: Deque[Crumb] = collections.deque(maxlen=maxlen)
+
+    def record(self, crumb: Crumb) -> None:
+        self.crumbs.append(crumb)
+
+    @staticmethod
+    def to_breadcrumb(crumb: Crumb) -> Dict[str, Any]:
+        data: Dict[str, Any] = {
+            "author_id" if crumb.category != "on_interaction" else "user_id": crumb.user_id,
+            "guild_id": crumb.guild_id,
+            "channel_id": crumb.channel_id,
+        }
+        if crumb.category == "on_interaction":
+            data["interaction_id"] = crumb.subject
+            data["message_id"] = crumb.extra
+            message = f'Interaction "{crumb.subject}" ran for {crumb.user_name} ({crumb.user_id})'
+        else:
+            data["command_name"] = crumb.subject
+            data["cog_name"] = crumb.extra
+            verb = {"on_command": "ran", "on_command_completion": "completed"}.get(
+                crumb.category, "failed"
+            )
+            message = f'Command "{crumb.subject}" {verb} for {crumb.user_name} ({crumb.user_id})'
+        return {
+            "type": "user",
+            "category": crumb.category,
+            "level": crumb.level,
+            "message": message,
+            "data": data,
+            "timestamp": datetime.datetime.fromtimestamp(crumb.timestamp, datetime.timezone.utc),
+        }
+
+    def before_send(self, event: Dict[str, Any], hint: Mapping[str, Any]) -> Dict[str, Any]:
+        """The ``before_send`` hook of the SDK, merges the buffered crumbs into the event."""
+        if not self.crumbs:
+            return event
+        breadcrumbs = event.get("breadcrumbs")
+        if isinstance(breadcrumbs, dict):
+            values = list(breadcrumbs.get("values") or [])
+        else:
+            values = list(breadcrumbs or [])
+        values.extend(self.to_breadcrumb(crumb) for crumb in self.crumbs)
+        values.sort(key=lambda breadcrumb: timestamp_of(breadcrumb.get("timestamp")) or 0.0)
+        event["breadcrumbs"] = {"values": values[-self.crumbs.maxlen:]}
+        return event
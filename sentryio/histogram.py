@@ -0,0 +1,60 @@
+import array
+import math
+from typing import Optional
+
+# Bucket bounds grow by this factor, so percentiles are accurate to about 10%.
+BUCKET_GROWTH = 1.2
+MIN_LATENCY = 0.001
+MAX_LATENCY = 600.0
+BUCKET_COUNT = math.ceil(math.log(MAX_LATENCY / MIN_LATENCY, BUCKET_GROWTH)) + 2
+
+
+class LatencyHistogram:
+    """Fixed-memory histogram of latencies on a logarithmic scale.
+
+    The first bucket takes everything below ``MIN_LATENCY``, the last everything above ``MAX_LATENCY``.
+    """
+
+    __slots__ = ("counts", "count", "errors", "total", "max")
+
+    def __init__(self) -> None:
+        self.counts = array.array("Q", bytes(8 * BUCKET_COUNT))
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    @staticmethod
+    def _bucket(latency: float) -> int:
+        if latency < MIN_LATENCY:
+            return 0
+        return min(BUCKET_COUNT - 1, int(math.log(latency / MIN_LATENCY, BUCKET_GROWTH)) + 1)
+
+    @staticmethod
+    def _upper_bound(bucket: int) -> float:
+        return MIN_LATENCY * BUCKET_GROWTH ** bucket
+
+    def record(self, latency: float, *, error: bool = False) -> None:
+        self.counts[self._bucket(latency)] += 1
+        self.count += 1
+        self.total += latency
+        self.max = max(self.max, latency)
+        if error:
+            self.errors += 1
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for bucket, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                if bucket == BUCKET_COUNT - 1:
+                    return self.max
+                return min(self._upper_bound(bucket), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
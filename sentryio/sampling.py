@@ -0,0 +1,126 @@
+import datetime
+import logging
+import random
+import time
+from typing import Any, Dict, Mapping, Optional
+
+log = logging.getLogger("red.sentinel.sentryio.sampling")
+
+
+def timestamp_of(value: Any) -> Optional[float]:
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime.datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        try:
+            return datetime.datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            return None
+    return None
+
+
+class TokenBucket:
+    """Allows ``rate`` events per second on average, with bursts of up to one second's worth."""
+
+    def __init__(self, rate: float) -> None:
+        self.rate = rate
+        self._tokens = max(rate, 1.0)
+        self._updated_at = time.monotonic()
+
+    def take(self) -> bool:
+        if self.rate <= 0:
+            return True  # no cap
+        now = time.monotonic()
+        capacity = max(self.rate, 1.0)
+        self._tokens = min(capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+
+class TraceSampler:
+    """Decides which transactions are sent to Sentry.
+
+    The rate of a transaction is the rate of its command, else the rate of its cog,
+    else the default rate. Commands and cogs are taken from the ``command`` and ``cog``
+    keys of the custom sampling context, falling back to the transaction name for commands.
+
+    When slow or failed transactions should always be kept, the decision can only be made
+    once the transaction is finished, so everything is recorded and the rates are applied
+    in ``before_send_transaction`` instead. Otherwise the sampler decides upfront
+    and unsampled transactions cost next to nothing.
+    At most ``max_per_second`` transactions are sent either way.
+    """
+
+    def __init__(self) -> None:
+        self.default_rate = 0.0
+        self.cog_rates: Dict[str, float] = {}
+        self.command_rates: Dict[str, float] = {}
+        self.slow_threshold = 0.0
+        self.keep_errors = False
+        self.bucket = TokenBucket(0)
+        self.dropped = 0
+
+    def update(self, settings: Mapping[str, Any]) -> None:
+        self.default_rate = settings["traces_default_rate"]
+        self.cog_rates = {name.lower(): rate for name, rate in settings["traces_cog_rates"].items()}
+        self.command_rates = {
+            name.lower(): rate for name, rate in settings["traces_command_rates"].items()
+        }
+        self.slow_threshold = settings["traces_slow_threshold"]
+        self.keep_errors = settings["traces_keep_errors"]
+        self.bucket = TokenBucket(settings["traces_max_per_second"])
+
+    @property
+    def decides_late(self) -> bool:
+        return self.slow_threshold > 0 or self.keep_errors
+
+    def rate_for(self, command: Optional[str], cog: Optional[str]) -> float:
+        if command is not None and command.lower() in self.command_rates:
+            return self.command_rates[command.lower()]
+        if cog is not None and cog.lower() in self.cog_rates:
+            return self.cog_rates[cog.lower()]
+        return self.default_rate
+
+    def _sample(self, rate: float) -> bool:
+        if rate <= 0 or random.random() >= rate:
+            return False
+        if not self.bucket.take():
+            self.dropped += 1
+            return False
+        return True
+
+    def __call__(self, sampling_context: Mapping[str, Any]) -> float:
+        """The ``traces_sampler`` of the SDK."""
+        if self.decides_late:
+            return 1.0
+        command = sampling_context.get("command")
+        if command is None:
+            command = (sampling_context.get("transaction_context") or {}).get("name")
+        rate = self.rate_for(command, sampling_context.get("cog"))
+        return 1.0 if self._sample(rate) else 0.0
+
+    def before_send_transaction(self, event: Dict[str, Any], hint: Mapping[str, Any]):
+        """The ``before_send_transaction`` hook of the SDK."""
+        if not self.decides_late:
+            return event
+        tags = event.get("tags") or {}
+        status = ((event.get("contexts") or {}).get("trace") or {}).get("status")
+        if self.keep_errors and status not in (None, "ok"):
+            return event if self._keep_anyway() else None
+        if self.slow_threshold > 0:
+            started = timestamp_of(event.get("start_timestamp"))
+            finished = timestamp_of(event.get("timestamp"))
+            if started is not None and finished is not None and finished - started >= self.slow_threshold:
+                return event if self._keep_anyway() else None
+        rate = self.rate_for(tags.get("command", event.get("transaction")), tags.get("cog"))
+        return event if self._sample(rate) else None
+
+    def _keep_anyway(self) -> bool:
+        if self.bucket.take():
+            return True
+        self.dropped += 1
+        return False
@@ -0,0 +1,419 @@
+import collections
+import gzip
+import logging
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Counter, Dict, List, Optional, Tuple, Type
+from urllib.request import getproxies
+
+import certifi
+import urllib3
+from sentry_sdk.envelope import Envelope
+from sentry_sdk.transport import KEEP_ALIVE_SOCKET_OPTIONS, Transport
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+log = logging.getLogger("red.sentinel.sentryio.transport")
+
+# Envelopes waiting in memory when the SDK's transport_queue_size isn't set,
+# anything past the limit is dropped instead of growing the queue.
+QUEUE_SIZE = 100
+# Envelopes sent in one go before checking the spool, over the pool's kept-alive connection.
+BATCH_SIZE = 20
+# How long the worker waits for new envelopes before looking at the spool again.
+IDLE_INTERVAL = 5.0
+REQUEST_TIMEOUT = 10.0
+# Spooled envelopes sent after each batch, so replaying doesn't hold back new events for long.
+REPLAY_BATCH = 20
+MAX_SPOOL_FILES = 500
+MAX_SPOOL_BYTES = 20 * 1024 * 1024
+# Backoff after the endpoint couldn't be reached, doubling up to the maximum.
+MIN_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+# Used when a 429 comes without a usable Retry-After.
+DEFAULT_RETRY_AFTER = 60.0
+
+SPOOL_SUFFIX = ".envelope"
+
+# outcomes of a request
+SENT = "sent"
+REJECTED = "rejected"
+RATE_LIMITED = "rate_limited"
+UNREACHABLE = "unreachable"
+
+_STOP = object()
+
+
+def _lock_file(fp) -> None:
+    """Block until the file is locked, the lock is released when it's closed."""
+    if fcntl is not None:
+        fcntl.flock(fp, fcntl.LOCK_EX)
+        return
+    fp.seek(0)
+    while True:
+        try:
+            msvcrt.locking(fp.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            pass  # gave up after 10 seconds, keep waiting
+
+
+class SpoolingTransport(Transport):
+    """Sends envelopes from a worker thread, spooling them to disk while Sentry is unreachable.
+
+    ``capture_envelope`` only puts the envelope on a bounded queue, serializing,
+    compressing and sending all happen on the worker, which sends whatever is queued
+    in batches. Envelopes that can't be delivered because the endpoint is down or failing
+    are written to the spool directory and replayed, oldest first, once a request
+    succeeds again. Envelopes are dropped when the queue or the spool are full,
+    or while Sentry rate limits us, and every outcome is counted.
+
+    The SDK creates the transport from its options, pass the class returned
+    by `with_spool` to ``sentry_sdk.init``. Only one transport at a time uses a spool,
+    a new one waits until the worker of the previous one is done with it.
+    """
+
+    spool_dir: Path
+
+    @classmethod
+    def with_spool(cls, spool_dir: Path) -> Type["SpoolingTransport"]:
+        """Get the transport class for ``sentry_sdk.init`` that spools to the directory."""
+        return type(cls.__name__, (cls,), {"spool_dir": spool_dir})
+
+    def __init__(self, options: Dict[str, Any]) -> None:
+        super().__init__(options)
+        assert self.parsed_dsn is not None
+        auth = self.parsed_dsn.to_auth()
+        self._url = auth.get_api_url()
+        self._headers = {
+            "Content-Type": "application/x-sentry-envelope",
+            "Content-Encoding": "gzip",
+            "X-Sentry-Auth": auth.to_header(),
+        }
+        self._pool = self._make_pool(options)
+
+        self.sent = 0
+        self.replayed = 0
+        self.spooled = 0
+        # dropped because the queue was full
+        self.dropped = 0
+        # dropped because the spool was full
+        self.discarded = 0
+        self.rate_limited = 0
+        self.rejected = 0
+        # reason -> events the SDK reported as lost, e.g. to sampling or before_send
+        self.lost: Counter[str] = collections.Counter()
+
+        self._queue: "queue.Queue[Any]" = queue.Queue(options.get("transport_queue_size") or QUEUE_SIZE)
+        # only touched by the worker, once it holds the spool
+        self._spool_files = 0
+        self._spool_bytes = 0
+        self._backoff = MIN_BACKOFF
+        # monotonic times until which nothing is sent
+        self._retry_at = 0.0
+        self._rate_limited_until = 0.0
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sentryio-transport", daemon=True)
+        self._thread.start()
+
+    def _make_pool(self, options: Dict[str, Any]) -> urllib3.PoolManager:
+        """Create the connection pool from the SDK options, the same way the SDK's transport does."""
+        socket_options = list(options.get("socket_options") or ())
+        if options.get("keep_alive"):
+            used = {(option[0], option[1]) for option in socket_options}
+            socket_options.extend(
+                option for option in KEEP_ALIVE_SOCKET_OPTIONS if (option[0], option[1]) not in used
+            )
+        pool_options: Dict[str, Any] = {
+            "num_pools": 2,
+            "cert_reqs": "CERT_REQUIRED",
+            "ca_certs": (
+                options.get("ca_certs")
+                or os.environ.get("SSL_CERT_FILE")
+                or os.environ.get("REQUESTS_CA_BUNDLE")
+                or certifi.where()
+            ),
+            "cert_file": options.get("cert_file") or os.environ.get("CLIENT_CERT_FILE"),
+            "key_file": options.get("key_file") or os.environ.get("CLIENT_KEY_FILE"),
+            "timeout": urllib3.Timeout(total=REQUEST_TIMEOUT),
+        }
+        if socket_options:
+            pool_options["socket_options"] = socket_options
+
+        proxy = None
+        no_proxy = self._in_no_proxy()
+        https_proxy = options.get("https_proxy")
+        if self.parsed_dsn.scheme == "https" and https_proxy != "":
+            proxy = https_proxy or (not no_proxy and getproxies().get("https"))
+        http_proxy = options.get("http_proxy")
+        if not proxy and http_proxy != "":
+            proxy = http_proxy or (not no_proxy and getproxies().get("http"))
+        if not proxy:
+            return urllib3.PoolManager(**pool_options)
+        if options.get("proxy_headers"):
+            pool_options["proxy_headers"] = options["proxy_headers"]
+        if proxy.startswith("socks"):
+            try:
+                from urllib3.contrib.socks import SOCKSProxyManager
+            except ImportError:
+                log.warning("SOCKS proxies need PySocks, sending to Sentry without the proxy %s", proxy)
+                return urllib3.PoolManager(**pool_options)
+            return SOCKSProxyManager(proxy, **pool_options)
+        return urllib3.ProxyManager(proxy, **pool_options)
+
+    def _in_no_proxy(self) -> bool:
+        no_proxy = getproxies().get("no")
+        if not no_proxy:
+            return False
+        for host in no_proxy.split(","):
+            host = host.strip()
+            if self.parsed_dsn.host.endswith(host) or self.parsed_dsn.netloc.endswith(host):
+                return True
+        return False
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def spool_size(self) -> Tuple[int, int]:
+        """The number of spooled envelopes and their total size in bytes."""
+        return self._spool_files, self._spool_bytes
+
+    @property
+    def reachable(self) -> bool:
+        return time.monotonic() >= self._retry_at
+
+    def capture_envelope(self, envelope: Envelope) -> None:
+        if self._stopping.is_set():
+            return
+        try:
+            self._queue.put_nowait(envelope)
+        except queue.Full:
+            self.dropped += 1
+            for item in envelope.items:
+                self.record_lost_event("queue_overflow", item=item)
+
+    def record_lost_event(
+        self,
+        reason: str,
+        data_category: Optional[str] = None,
+        item: Optional[Any] = None,
+        *,
+        quantity: int = 1,
+    ) -> None:
+        self.lost[reason] += 1 if item is not None else quantity
+
+    def is_healthy(self) -> bool:
+        return not self._queue.full() and time.monotonic() >= self._rate_limited_until
+
+    def flush(self, timeout: float, callback: Optional[Any] = None) -> None:
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            pending = self._queue.unfinished_tasks
+            if pending and callback is not None:
+                callback(pending, timeout)
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._queue.all_tasks_done.wait(remaining)
+
+    def kill(self) -> None:
+        """Stop the worker without waiting for it.
+
+        The worker spools whatever wasn't sent yet, the SDK already gave it
+        the close timeout to send it, and releases the spool for the next transport.
+        """
+        self._stopping.set()
+        try:
+            self._queue.put_nowait(_STOP)
+        except queue.Full:
+            pass  # the worker is busy and notices once it's done with the current batch
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the worker to stop, returns whether it did."""
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    # worker thread
+
+    def _run(self) -> None:
+        lock_path = self.spool_dir.with_name(f"{self.spool_dir.name}.lock")
+        try:
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            lock_file = open(lock_path, "a+b")
+        except OSError:
+            log.exception("Couldn't open the Sentry spool at %s", self.spool_dir)
+            return
+        with lock_file:
+            # a transport that's still shutting down might be using the spool
+            _lock_file(lock_file)
+            self._scan_spool()
+            while not self._stopping.is_set():
+                taken = 0
+                batch: List[Envelope] = []
+                # don't wait for new envelopes while there's a spool to replay
+                replaying = (
+                    bool(self._spool_files)
+                    and self.reachable
+                    and time.monotonic() >= self._rate_limited_until
+                )
+                while len(batch) < BATCH_SIZE:
+                    try:
+                        # wait for the first envelope only, then take what's already queued
+                        envelope = self._queue.get(block=not (taken or replaying), timeout=IDLE_INTERVAL)
+                    except queue.Empty:
+                        break
+                    taken += 1
+                    if envelope is _STOP:
+                        break
+                    batch.append(envelope)
+                try:
+                    if batch:
+                        self._send_batch([self._encode(envelope) for envelope in batch])
+                    if self._spool_files and self.reachable:
+                        self._replay()
+                except Exception:
+                    log.exception("Unexpected error in the Sentry transport")
+                finally:
+                    for _ in range(taken):
+                        self._queue.task_done()
+            self._spool_remaining()
+        self._pool.clear()
+
+    def _spool_remaining(self) -> None:
+        while True:
+            try:
+                envelope = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                if envelope is not _STOP:
+                    self._spool(self._encode(envelope))
+            except Exception:
+                log.exception("Couldn't spool a Sentry envelope")
+            finally:
+                self._queue.task_done()
+
+    def _encode(self, envelope: Envelope) -> bytes:
+        return gzip.compress(envelope.serialize(), compresslevel=6)
+
+    def _post(self, body: bytes) -> str:
+        try:
+            response = self._pool.request(
+                "POST", self._url, body=body, headers=self._headers, retries=False
+            )
+        except (OSError, urllib3.exceptions.HTTPError) as e:
+            log.debug("Couldn't reach Sentry: %s", e)
+            return self._unreachable()
+        if response.status == 429:
+            try:
+                retry_after = float(response.headers.get("Retry-After", DEFAULT_RETRY_AFTER))
+            except ValueError:
+                retry_after = DEFAULT_RETRY_AFTER
+            log.debug("Rate limited by Sentry for %ss", retry_after)
+            self._rate_limited_until = time.monotonic() + retry_after
+            return RATE_LIMITED
+        if response.status >= 500:
+            log.debug("Sentry responded with %s", response.status)
+            return self._unreachable()
+        self._backoff = MIN_BACKOFF
+        if response.status >= 400:
+            log.debug("Sentry rejected an envelope with %s", response.status)
+            return REJECTED
+        return SENT
+
+    def _unreachable(self) -> str:
+        self._retry_at = time.monotonic() + self._backoff
+        self._backoff = min(MAX_BACKOFF, self._backoff * 2)
+        return UNREACHABLE
+
+    def _send_batch(self, bodies: List[bytes]) -> None:
+        for body in bodies:
+            now = time.monotonic()
+            if now < self._rate_limited_until:
+                self.rate_limited += 1
+                continue
+            if now < self._retry_at or self._stopping.is_set():
+                self._spool(body)
+                continue
+            outcome = self._post(body)
+            if outcome == SENT:
+                self.sent += 1
+            elif outcome == REJECTED:
+                self.rejected += 1
+            elif outcome == RATE_LIMITED:
+                self.rate_limited += 1
+            else:
+                self._spool(body)
+
+    def _replay(self) -> None:
+        paths = sorted(self.spool_dir.glob(f"*{SPOOL_SUFFIX}"))[:REPLAY_BATCH]
+        for path in paths:
+            if self._stopping.is_set() or time.monotonic() < self._rate_limited_until:
+                return
+            try:
+                body = path.read_bytes()
+            except OSError:
+                continue
+            outcome = self._post(body)
+            if outcome == UNREACHABLE:
+                return
+            if outcome == RATE_LIMITED:
+                # the envelope stays spooled and is retried once the limit is over
+                continue
+            if outcome == SENT:
+                self.replayed += 1
+            else:
+                self.rejected += 1
+            self._unspool(path, len(body))
+
+    # spool, only used by the worker while it holds the spool's lock
+
+    def _scan_spool(self) -> None:
+        files = 0
+        size = 0
+        try:
+            for path in self.spool_dir.iterdir():
+                if path.suffix == SPOOL_SUFFIX:
+                    files += 1
+                    size += path.stat().st_size
+                else:
+                    path.unlink()  # leftover of an interrupted write
+        except OSError:
+            log.exception("Couldn't read the Sentry spool at %s", self.spool_dir)
+        self._spool_files = files
+        self._spool_bytes = size
+
+    def _spool(self, body: bytes) -> None:
+        if self._spool_files >= MAX_SPOOL_FILES or self._spool_bytes + len(body) > MAX_SPOOL_BYTES:
+            self.discarded += 1
+            return
+        path = self.spool_dir / f"{time.time_ns():020d}-{self.spooled:06d}{SPOOL_SUFFIX}"
+        temp = path.with_suffix(".tmp")
+        try:
+            temp.write_bytes(body)
+            os.replace(temp, path)
+        except OSError as e:
+            log.warning("Couldn't spool a Sentry envelope: %s", e)
+            self.discarded += 1
+            return
+        self._spool_files += 1
+        self._spool_bytes += len(body)
+        self.spooled += 1
+
+    def _unspool(self, path: Path, size: int) -> None:
+        try:
+            path.unlink()
+        except OSError:
+            return
+        self._spool_files -= 1
+        self._spool_bytes -= size
@@ -0,0 +1,143 @@
+import asyncio
+import collections
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Deque, List, NamedTuple, Optional
+
+import sentry_sdk
+
+log = logging.getLogger("red.sentinel.sentryio.watchdog")
+
+# How often the heartbeat task runs, in seconds.
+HEARTBEAT_INTERVAL = 0.1
+# Frames kept from the stack sample, innermost last.
+STACK_LIMIT = 30
+MAX_STALLS = 20
+
+
+class Stall(NamedTuple):
+    started_at: float  # wall clock time
+    duration: float
+    # what was running: the task and its coroutine, or "callback" outside of tasks
+    running: str
+    # innermost frame of the stack sample, as "file:line in function"
+    location: str
+    stack: List[str]
+
+
+class LoopWatchdog:
+    """Detects when the event loop is blocked.
+
+    A heartbeat task records when the loop last got to run. A separate thread checks that
+    regularly, once the heartbeat is older than the threshold it samples the stack
+    of the loop's thread, and when the loop runs again the stall is reported
+    with its full duration, to the log and to Sentry.
+    """
+
+    def __init__(self, threshold: float) -> None:
+        self.threshold = threshold
+        self.stalls: Deque[Stall] = collections.deque(maxlen=MAX_STALLS)
+        self.max_lag = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop = threading.Event()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(
+            target=self._watch, args=(self._stop,), name="sentryio-loop-watchdog", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        self._stop.set()
+        self._thread = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            now = time.monotonic()
+            self.max_lag = max(self.max_lag, now - before - HEARTBEAT_INTERVAL)
+            self._last_beat = now
+
+    def _what_is_running(self) -> str:
+        # reading the current task from another thread is racy, but only used for reporting
+        task = asyncio.current_task(self._loop)
+        if task is None:
+            return "callback"
+        coro = task.get_coro()
+        return f"{task.get_name()} ({getattr(coro, '__qualname__', coro)})"
+
+    def _sample(self) -> Optional[Stall]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+        summary = traceback.extract_stack(frame, limit=STACK_LIMIT)
+        innermost = summary[-1] if summary else None
+        location = (
+            f"{innermost.filename}:{innermost.lineno} in {innermost.name}" if innermost else "unknown"
+        )
+        return Stall(
+            started_at=time.time() - (time.monotonic() - self._last_beat),
+            duration=0.0,
+            running=self._what_is_running(),
+            location=location,
+            stack=traceback.format_list(summary),
+        )
+
+    def _watch(self, stop: threading.Event) -> None:
+        check_interval = max(0.05, self.threshold / 4)
+        stall: Optional[Stall] = None
+        stalled_beat = 0.0
+        while not stop.wait(check_interval):
+            lag = time.monotonic() - self._last_beat
+            if stall is None:
+                if lag >= self.threshold + HEARTBEAT_INTERVAL:
+                    stalled_beat = self._last_beat
+                    stall = self._sample()
+            elif self._last_beat != stalled_beat:
+                # the loop got to run again
+                stall = stall._replace(duration=self._last_beat - stalled_beat - HEARTBEAT_INTERVAL)
+                self._report(stall)
+                stall = None
+
+    def _report(self, stall: Stall) -> None:
+        self.stalls.append(stall)
+        log.warning(
+            "Event loop was blocked for %.2fs while running %s at %s\n%s",
+            stall.duration,
+            stall.running,
+            stall.location,
+            "".join(stall.stack),
+        )
+        if not sentry_sdk.get_client().is_active():
+            return
+        with sentry_sdk.new_scope() as scope:
+            scope.set_tag("blocking_location", stall.location)
+            scope.set_extra("running", stall.running)
+            scope.set_extra("duration", stall.duration)
+            scope.set_extra("stack", "".join(stall.stack))
+            scope.fingerprint = ["event-loop-blocked", stall.location]
+            sentry_sdk.capture_message(
+                f"Event loop blocked for {stall.duration:.2f}s at {stall.location}", level="warning"
+            )